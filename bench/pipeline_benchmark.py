@@ -0,0 +1,563 @@
+"""
+TubeLetter 파이프라인 처리량 벤치마크 (오프라인)
+
+YouTube RSS, 자막 API, Gemini, SMTP를 로컬 가짜 객체로 바꾼 뒤
+process_youtube_automation()을 그대로 실행하여 처리량/메모리/한도 효율을 측정합니다.
+가짜 객체마다 지연 시간, 오류율, 429 동작을 설정할 수 있고, 채널 목록은
+Ref/구독정보.csv를 원하는 채널 수만큼 늘려 만든 가상 피드를 사용합니다.
+
+python bench/pipeline_benchmark.py                                  # 구독정보.csv 채널 수 그대로
+python bench/pipeline_benchmark.py --channels 2000 --new-videos-per-channel 1
+python bench/pipeline_benchmark.py --gemini-429-rate 0.05 --gemini-server-rpm 600
+python bench/pipeline_benchmark.py --runs 2 --json bench_result.json  # 2회차는 캐시/조건부 요청 효과
+"""
+import argparse
+import collections
+import csv
+import importlib.util
+import json
+import logging
+import os
+import random
+import shutil
+import smtplib
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+import urllib.error
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+try:
+    import resource  # 유닉스 전용 (최대 RSS)
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'tube.letter.py')
+CHANNEL_CSV = os.path.join(ROOT, 'Ref', '구독정보.csv')
+FEED_URL = 'https://www.youtube.com/feeds/videos.xml?channel_id={}'
+FEED_ENTRIES = 15  # YouTube 채널 피드는 최근 영상 15개를 제공
+
+def load_channels(csv_path, count=None):
+    """구독정보.csv에서 (채널 ID, 채널 제목) 목록을 읽고 count개가 될 때까지 복제하여 늘림"""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        base = [(row['채널 ID'], row['채널 제목']) for row in csv.DictReader(f)]
+    if not base:
+        raise SystemExit(f"❌ 채널 목록이 비어 있습니다: {csv_path}")
+    count = count or len(base)
+    channels = []
+    for i in range(count):
+        channel_id, title = base[i % len(base)]
+        copy = i // len(base)
+        if copy:
+            channel_id, title = f"{channel_id}-{copy}", f"{title} #{copy}"
+        channels.append((channel_id, title))
+    return channels
+
+def _sleep(latency):
+    """평균 latency초 근처에서 무작위로 대기 (0.5배 ~ 1.5배)"""
+    if latency > 0:
+        time.sleep(latency * random.uniform(0.5, 1.5))
+
+class FakeYouTube:
+    """채널별 가상 RSS 피드와 자막을 제공하는 가짜 YouTube
+
+    피드는 ETag를 지원하며, 새 영상이 없으면 304를 반환합니다.
+    """
+
+    def __init__(self, channels, new_videos, hours_to_check, feed_latency, feed_error_rate,
+                 transcript_latency, no_transcript_rate, transcript_error_rate, transcript_words):
+        self.feed_latency = feed_latency
+        self.feed_error_rate = feed_error_rate
+        self.transcript_latency = transcript_latency
+        self.no_transcript_rate = no_transcript_rate
+        self.transcript_error_rate = transcript_error_rate
+        self.transcript_words = transcript_words
+        self.hours_to_check = hours_to_check
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.channels = {}  # feed_url -> {'title', 'videos': [(video_id, title, published)], 'version'}
+        now = datetime.now(timezone.utc)
+        for channel_id, title in channels:
+            # 확인 기간 밖의 오래된 영상으로 피드를 채운 뒤 새 영상 추가
+            videos = [
+                (f"{channel_id}-old{n}", f"{title} 지난 영상 {n}", now - timedelta(days=n + 1))
+                for n in range(FEED_ENTRIES)
+            ]
+            self.channels[FEED_URL.format(channel_id)] = {'title': title, 'videos': videos, 'version': 0, 'xml': None}
+            self.publish(FEED_URL.format(channel_id), new_videos)
+
+    def publish(self, feed_url, count):
+        """채널에 확인 기간 안에 게시된 새 영상 count개 추가"""
+        channel = self.channels[feed_url]
+        now = datetime.now(timezone.utc)
+        for _ in range(count):
+            channel['version'] += 1
+            video_id = f"{feed_url.rsplit('=', 1)[1]}-v{channel['version']}"
+            published = now - timedelta(hours=random.uniform(0, self.hours_to_check / 2))
+            # 실제 피드처럼 최신순 유지 (새 영상은 기존 영상보다 나중에 게시됨)
+            published = max(published, channel['videos'][0][2] + timedelta(seconds=1))
+            channel['videos'].insert(0, (video_id, f"{channel['title']} 새 영상 {channel['version']}", published))
+        del channel['videos'][FEED_ENTRIES:]
+        channel['xml'] = None
+
+    def publish_random(self, rate):
+        """각 채널에 rate 확률로 새 영상 1개 추가 (반복 실행 사이에 사용)"""
+        for feed_url in self.channels:
+            if random.random() < rate:
+                self.publish(feed_url, 1)
+
+    def _render(self, channel):
+        entries = "".join(
+            f"<entry><yt:videoId>{escape(video_id)}</yt:videoId><title>{escape(title)}</title>"
+            f"<link rel=\"alternate\" href=\"https://www.youtube.com/watch?v={escape(video_id)}\"/>"
+            f"<published>{published.isoformat(timespec='seconds')}</published>"
+            f"<media:group><media:description>{escape(title)} 설명입니다.</media:description></media:group></entry>"
+            for video_id, title, published in channel['videos']
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:yt="http://www.youtube.com/xml/schemas/2015" '
+            'xmlns:media="http://search.yahoo.com/mrss/">'
+            f"<title>{escape(channel['title'])}</title>{entries}</feed>"
+        ).encode('utf-8')
+
+    def download_feed(self, feed_url, timeout, etag=None, modified=None):
+        """tube.letter의 _download_feed 대체 ((상태 코드, 본문, 헤더) 반환)"""
+        _sleep(self.feed_latency)
+        if random.random() < self.feed_error_rate:
+            self._count('feed_errors')
+            raise urllib.error.URLError('fake feed timeout')
+        with self.lock:
+            channel = self.channels[feed_url]
+            current_etag = f'"{channel["version"]}"'
+            if etag == current_etag:
+                self.counters['feed_not_modified'] += 1
+                return 304, None, {'ETag': current_etag}
+            if channel['xml'] is None:
+                channel['xml'] = self._render(channel)
+            self.counters['feed_downloads'] += 1
+            return 200, channel['xml'], {'ETag': current_etag}
+
+    def fetch_transcript(self, video_id, languages=None):
+        """가짜 YouTubeTranscriptApi.fetch (자막 구간 리스트 반환)"""
+        _sleep(self.transcript_latency)
+        roll = random.random()
+        if roll < self.transcript_error_rate:
+            self._count('transcript_errors')
+            raise _transcript_api.RequestBlocked(video_id)
+        if roll < self.transcript_error_rate + self.no_transcript_rate:
+            self._count('transcripts_missing')
+            raise _transcript_api.NoTranscriptFound(video_id)
+        self._count('transcripts')
+        words = [f"{video_id}에서 말한 내용 {n}" for n in range(self.transcript_words // 4)]
+        # 자동 생성 자막처럼 앞 구간의 끝이 다음 구간 처음에 다시 나오고, 가끔 [음악] 표시가 섞임
+        segments = []
+        for i in range(0, len(words), 3):
+            text = " ".join(words[max(0, i - 1):i + 3])
+            if i % 60 == 0:
+                text = f"[음악] {text}"
+            segments.append({'text': text, 'start': i * 2.0, 'duration': 2.0})
+        return segments
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+def _make_transcript_api_module(youtube):
+    """youtube_transcript_api 모듈을 대신할 가짜 모듈 (실제 get_transcript_segments 코드가 그대로 실행됨)"""
+    module = types.ModuleType('youtube_transcript_api')
+
+    class CouldNotRetrieveTranscript(Exception):
+        pass
+
+    class NoTranscriptFound(CouldNotRetrieveTranscript):
+        pass
+
+    class TranscriptsDisabled(CouldNotRetrieveTranscript):
+        pass
+
+    class RequestBlocked(CouldNotRetrieveTranscript):
+        pass
+
+    class FetchedTranscript:
+        def __init__(self, segments, language_code):
+            self.segments = segments
+            self.language_code = language_code
+
+        def to_raw_data(self):
+            return self.segments
+
+    class YouTubeTranscriptApi:
+        def fetch(self, video_id, languages=('en',)):
+            return FetchedTranscript(youtube.fetch_transcript(video_id, languages), languages[0])
+
+    module.CouldNotRetrieveTranscript = CouldNotRetrieveTranscript
+    module.NoTranscriptFound = NoTranscriptFound
+    module.TranscriptsDisabled = TranscriptsDisabled
+    module.RequestBlocked = RequestBlocked
+    module.YouTubeTranscriptApi = YouTubeTranscriptApi
+    return module
+
+_transcript_api = None  # run_benchmark()에서 생성한 가짜 youtube_transcript_api 모듈
+
+class FakeGeminiError(Exception):
+    pass
+
+class FakeGemini:
+    """client.models.generate_content를 흉내내는 가짜 Gemini 클라이언트
+
+    API 키/모델마다 server_rpm을 넘는 요청과 rate_429 확률의 요청은 429로, leaked_keys에 든 키의
+    요청은 403으로 거절합니다. client(api_key)가 키 하나의 클라이언트를 반환합니다.
+    """
+
+    def __init__(self, latency, latency_per_1k_tokens, error_rate, rate_429, server_rpm, leaked_keys=()):
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.server_rpm = server_rpm
+        self.leaked_keys = set(leaked_keys)
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.recent = collections.defaultdict(collections.deque)  # (키, 모델)별 최근 60초 동안 받은 요청 시각
+
+    def client(self, api_key):
+        models = types.SimpleNamespace(
+            generate_content=lambda model, contents, config=None: self.generate_content(api_key, model, contents, config)
+        )
+        return types.SimpleNamespace(models=models)
+
+    def generate_content(self, api_key, model, contents, config=None):
+        prompt_tokens = max(1, len(contents) // 3)
+        with self.lock:
+            self.counters['requests'] += 1
+            self.counters[f'requests:{model}'] += 1
+            now = time.monotonic()
+            recent = self.recent[api_key, model]
+            while recent and now - recent[0] > 60:
+                recent.popleft()
+            over_limit = self.server_rpm and len(recent) >= self.server_rpm
+            recent.append(now)
+        if api_key in self.leaked_keys:
+            self._count('forbidden')
+            raise FakeGeminiError('403 PERMISSION_DENIED: Your API key was reported as leaked. (fake)')
+        if over_limit or random.random() < self.rate_429:
+            self._count('rate_limited')
+            raise FakeGeminiError('429 RESOURCE_EXHAUSTED (fake)')
+        _sleep(self.latency + self.latency_per_1k_tokens * prompt_tokens / 1000)
+        if random.random() < self.error_rate:
+            self._count('errors')
+            raise FakeGeminiError('500 INTERNAL (fake)')
+        with self.lock:
+            self.counters['ok'] += 1
+            self.counters['prompt_tokens'] += prompt_tokens
+        text = f"## 핵심 요약\n\n- 가짜 요약 ({prompt_tokens} 토큰 입력)\n"
+        usage = types.SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=len(text) // 3)
+        return types.SimpleNamespace(text=text, usage_metadata=usage)
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+class FakeBatchBackend:
+    """tube.letter의 BatchBackend를 흉내내는 가짜 Gemini 배치 작업 백엔드
+
+    제출한 JSONL 파일을 읽어 두었다가 latency초가 지나면 작업을 완료 상태로 바꾸고,
+    요청마다 error_rate 확률로 실패한 결과를 돌려줍니다.
+    """
+
+    def __init__(self, latency, error_rate):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.jobs = {}  # 작업 이름 -> (제출 시각, [(key, 프롬프트 토큰 수)])
+
+    def submit(self, jsonl_path, model, display_name):
+        requests = []
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                item = json.loads(line)
+                prompt = item['request']['contents'][0]['parts'][0]['text']
+                requests.append((item['key'], max(1, len(prompt) // 3)))
+        with self.lock:
+            name = f"batches/fake-{len(self.jobs) + 1}"
+            self.jobs[name] = (time.monotonic(), requests)
+            self.counters['batch_jobs'] += 1
+            self.counters['batch_requests'] += len(requests)
+            self.counters['batch_prompt_tokens'] += sum(tokens for _, tokens in requests)
+        return name
+
+    def status(self, job_name):
+        submitted_at, _ = self.jobs[job_name]
+        return 'succeeded' if time.monotonic() - submitted_at >= self.latency else 'running'
+
+    def results(self, job_name):
+        _, requests = self.jobs[job_name]
+        results = {}
+        for key, tokens in requests:
+            if random.random() < self.error_rate:
+                results[key] = None
+                continue
+            results[key] = f"## 핵심 요약\n\n- 가짜 배치 요약 ({tokens} 토큰 입력)\n"
+        return results
+
+def make_fake_smtp(latency, error_rate, counters, lock):
+    """smtplib.SMTP_SSL / smtplib.SMTP 대신 쓸 가짜 SMTP 클래스 생성"""
+
+    class FakeSMTP:
+        def __init__(self, host=None, port=None, *args, **kwargs):
+            _sleep(latency)
+            with lock:
+                counters['connections'] += 1
+
+        def ehlo(self):
+            pass
+
+        def has_extn(self, name):
+            return False
+
+        def send_message(self, message, *args, **kwargs):
+            _sleep(latency)
+            if random.random() < error_rate:
+                with lock:
+                    counters['errors'] += 1
+                raise smtplib.SMTPServerDisconnected('fake disconnect')
+            with lock:
+                counters['messages'] += 1
+
+        def quit(self):
+            pass
+
+    return FakeSMTP
+
+def load_tubeletter():
+    """tube.letter.py를 모듈로 불러오기 (현재 작업 폴더에 상태 파일이 생성됨)"""
+    spec = importlib.util.spec_from_file_location('tube_letter', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def peak_rss_mb():
+    """프로세스 최대 RSS (MB, 측정할 수 없으면 None)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_benchmark(args):
+    global _transcript_api
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix='tubeletter-bench-')
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        tl = load_tubeletter()
+        channels = load_channels(args.channel_csv, args.channels)
+        youtube = FakeYouTube(
+            channels, args.new_videos_per_channel, tl.HOURS_TO_CHECK,
+            args.feed_latency, args.feed_error_rate,
+            args.transcript_latency, args.no_transcript_rate, args.transcript_error_rate,
+            args.transcript_words,
+        )
+        api_keys = [f"bench-key-{n}" for n in range(args.api_keys)]
+        gemini = FakeGemini(args.gemini_latency, args.gemini_latency_per_1k_tokens,
+                            args.gemini_error_rate, args.gemini_429_rate, args.gemini_server_rpm,
+                            leaked_keys=api_keys[:args.leaked_keys])
+        batch = FakeBatchBackend(args.batch_latency, args.batch_error_rate)
+        smtp_counters, smtp_lock = collections.Counter(), threading.Lock()
+        fake_smtp = make_fake_smtp(args.smtp_latency, args.smtp_error_rate, smtp_counters, smtp_lock)
+
+        # 외부 서비스 연결 지점을 가짜 객체로 교체
+        _transcript_api = _make_transcript_api_module(youtube)
+        sys.modules['youtube_transcript_api'] = _transcript_api
+        tl._download_feed = youtube.download_feed
+        smtplib.SMTP_SSL = fake_smtp
+        smtplib.SMTP = fake_smtp
+
+        # main()이 하는 설정을 벤치마크 값으로 대신 채움
+        tl.EMAIL_SENDER = 'bench@example.com'
+        tl.EMAIL_PASSWORD = 'bench'
+        tl.RECIPIENT_LIST = [f"reader{n}@example.com" for n in range(args.recipients)]
+        tl.DIGEST_MODE = args.digest
+        tl.RSS_FEEDS = list(youtube.channels)
+        tl.GEMINI_RETRY_BASE_DELAY = args.retry_delay
+        tl.GEMINI_TRANSIENT_COOLDOWN = args.retry_delay
+        tl.OUTBOX_RETRY_BASE_DELAY = args.retry_delay
+        tl.TRANSCRIPT_RETRY_BASE_DELAY = args.retry_delay
+        tl.OUTBOX_POLL_INTERVAL = 0.05
+        limits = dict(tl.GEMINI_FREE_TIER_LIMITS)
+        if not args.free_tier:
+            limits.update(requests_per_minute=args.client_rpm, requests_per_day=10_000_000,
+                          input_tokens_per_minute=10_000_000_000, input_tokens_per_day=10_000_000_000)
+        tl.gemini_pool = tl.GeminiClientPool(api_keys, args.gemini_models, limits, client_factory=gemini.client)
+        tl.processed_videos = tl.load_processed_videos()
+        tl.video_leases = tl.VideoLeases()
+        if args.batch_channels:
+            # 앞쪽 채널부터 지정한 비율만큼 batch 모드로 설정
+            batch_count = round(len(channels) * args.batch_channels)
+            tl.CHANNELS = [
+                {'channel_id': channel_id, 'name': title, 'feed_url': FEED_URL.format(channel_id),
+                 'mode': 'batch' if index < batch_count else 'realtime'}
+                for index, (channel_id, title) in enumerate(channels)
+            ]
+            tl.BATCH_MIN_REQUESTS = args.batch_min_requests
+            tl.batch_backend = batch
+
+        results = []
+        for run in range(1, args.runs + 1):
+            if run > 1:
+                youtube.publish_random(args.publish_rate)
+            for counters in (youtube.counters, gemini.counters, smtp_counters, batch.counters):
+                counters.clear()
+            if args.tracemalloc:
+                tracemalloc.start()
+            started = time.perf_counter()
+            tl.process_youtube_automation(auto_send=True, max_videos=args.max_videos,
+                                          report_file='run_report.json')
+            elapsed = time.perf_counter() - started
+            heap_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if args.tracemalloc else None
+            if args.tracemalloc:
+                tracemalloc.stop()
+            with open('run_report.json', 'r', encoding='utf-8') as f:
+                report = json.load(f)
+            results.append(summarize_run(run, elapsed, report, youtube.counters, gemini.counters,
+                                         smtp_counters, batch.counters, heap_peak))
+        return results
+    finally:
+        os.chdir(original_cwd)
+        if args.keep_workdir:
+            print(f"📁 작업 폴더: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def summarize_run(run, elapsed, report, youtube_counters, gemini_counters, smtp_counters, batch_counters, heap_peak):
+    """실행 보고서와 가짜 객체의 카운터로 측정 결과 계산"""
+    videos = report['videos']
+    processed = videos.get('processed', 0)
+    requests = gemini_counters['requests']
+    wasted = gemini_counters['rate_limited'] + gemini_counters['forbidden'] + gemini_counters['errors']
+    return {
+        'run': run,
+        'seconds': round(elapsed, 3),
+        'videos_processed': processed,
+        'videos_per_minute': round(processed / elapsed * 60, 1) if elapsed else None,
+        'videos_deferred': videos.get('deferred', 0) + videos.get('transcript_deferred', 0),
+        'emails_sent': videos.get('emails_sent', 0),
+        'emails_failed': videos.get('emails_failed', 0),
+        'feeds': dict(youtube_counters),
+        'smtp': dict(smtp_counters),
+        'gemini': dict(gemini_counters),
+        'batch': {
+            'enqueued': report['counters'].get('batch_enqueued', 0),
+            'results': report['counters'].get('batch_results', 0),
+            **batch_counters,
+        },
+        'quota': {
+            # 요청 하나로 몇 개의 영상을 요약했는지, 429/오류로 버린 요청 비율
+            'videos_per_request': round(processed / requests, 3) if requests else None,
+            'wasted_request_ratio': round(wasted / requests, 3) if requests else None,
+            'prompt_tokens_per_video': round(gemini_counters['prompt_tokens'] / processed) if processed else None,
+            'transcript_tokens_saved': report['counters'].get('transcript_tokens_saved', 0),
+        },
+        'summary_cache': report.get('summary_cache'),
+        'stages': report.get('stages'),
+        'peak_rss_mb': round(peak_rss_mb(), 1) if resource else None,
+        'peak_python_heap_mb': round(heap_peak, 1) if heap_peak is not None else None,
+    }
+
+def print_results(results):
+    print(f"\n{'='*60}")
+    print("📊 파이프라인 벤치마크 결과")
+    print(f"{'='*60}")
+    for result in results:
+        quota = result['quota']
+        print(f"\n▶ {result['run']}회차 실행: {result['seconds']}초")
+        print(f"   처리량: {result['videos_processed']}개 영상 ({result['videos_per_minute']}개/분), "
+              f"연기 {result['videos_deferred']}개")
+        print(f"   이메일: 발송 {result['emails_sent']}개, 실패 {result['emails_failed']}개, "
+              f"SMTP 연결 {result['smtp'].get('connections', 0)}회")
+        print(f"   피드: 다운로드 {result['feeds'].get('feed_downloads', 0)}회, "
+              f"304 {result['feeds'].get('feed_not_modified', 0)}회, 오류 {result['feeds'].get('feed_errors', 0)}회")
+        by_model = ", ".join(
+            f"{name.split(':', 1)[1]} {count}회" for name, count in result['gemini'].items() if name.startswith('requests:')
+        )
+        print(f"   Gemini: 요청 {result['gemini'].get('requests', 0)}회 (429 {result['gemini'].get('rate_limited', 0)}회, "
+              f"403 {result['gemini'].get('forbidden', 0)}회, 오류 {result['gemini'].get('errors', 0)}회) [{by_model}]")
+        print(f"   한도 효율: 요청당 영상 {quota['videos_per_request']}, 낭비된 요청 비율 {quota['wasted_request_ratio']}, "
+              f"영상당 입력 토큰 {quota['prompt_tokens_per_video']} (자막 정리로 총 {quota['transcript_tokens_saved']}토큰 절약)")
+        batch = result['batch']
+        if batch['enqueued'] or batch.get('batch_jobs') or batch['results']:
+            print(f"   배치: 대기열 저장 {batch['enqueued']}개, 작업 {batch.get('batch_jobs', 0)}개로 "
+                  f"{batch.get('batch_requests', 0)}개 요청 제출, 도착 {batch['results']}개")
+        memory = f"최대 RSS {result['peak_rss_mb']}MB"
+        if result['peak_python_heap_mb'] is not None:
+            memory += f", Python 힙 최대 {result['peak_python_heap_mb']}MB"
+        print(f"   메모리: {memory}")
+        for stage, timing in (result['stages'] or {}).items():
+            print(f"   ⏱ {stage:<12} {timing['count']:>6}회  p50 {timing['p50']:.3f}s  p95 {timing['p95']:.3f}s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TubeLetter 파이프라인 처리량 벤치마크 (오프라인)')
+    parser.add_argument('--channel-csv', default=CHANNEL_CSV, help='채널 목록 CSV (기본값: Ref/구독정보.csv)')
+    parser.add_argument('--channels', type=int, default=None, help='가상 채널 수 (기본값: CSV의 채널 수)')
+    parser.add_argument('--new-videos-per-channel', type=int, default=1, help='1회차 실행에서 채널별 새 영상 수')
+    parser.add_argument('--runs', type=int, default=1, help='연속 실행 횟수 (2회차부터 캐시/조건부 요청 효과 측정)')
+    parser.add_argument('--publish-rate', type=float, default=0.1, help='2회차부터 채널마다 새 영상이 올라올 확률')
+    parser.add_argument('--max-videos', type=int, default=None, help='실행당 최대 처리 영상 수')
+    parser.add_argument('--recipients', type=int, default=3, help='수신자 수')
+    parser.add_argument('--digest', action='store_true', help='다이제스트 모드로 실행')
+    parser.add_argument('--seed', type=int, default=1, help='난수 시드 (같은 값이면 같은 오류 패턴)')
+
+    fakes = parser.add_argument_group('가짜 서비스 설정 (지연 시간은 초 단위 평균값)')
+    fakes.add_argument('--feed-latency', type=float, default=0.05)
+    fakes.add_argument('--feed-error-rate', type=float, default=0.0)
+    fakes.add_argument('--transcript-latency', type=float, default=0.3)
+    fakes.add_argument('--transcript-words', type=int, default=3000, help='자막 길이 (단어 수)')
+    fakes.add_argument('--no-transcript-rate', type=float, default=0.1, help='자막 없는 영상 비율')
+    fakes.add_argument('--transcript-error-rate', type=float, default=0.0, help='일시적 자막 오류 비율')
+    fakes.add_argument('--gemini-latency', type=float, default=1.0)
+    fakes.add_argument('--gemini-latency-per-1k-tokens', type=float, default=0.05)
+    fakes.add_argument('--gemini-error-rate', type=float, default=0.0)
+    fakes.add_argument('--gemini-429-rate', type=float, default=0.0, help='무작위 429 응답 비율')
+    fakes.add_argument('--gemini-server-rpm', type=int, default=0, help='API 키/모델별 서버 측 분당 요청 한도 (0이면 없음)')
+    fakes.add_argument('--leaked-keys', type=int, default=0, help='403(유출 신고된 키)을 반환하는 API 키 수')
+    fakes.add_argument('--batch-latency', type=float, default=0.0, help='배치 작업이 완료될 때까지의 시간')
+    fakes.add_argument('--batch-error-rate', type=float, default=0.0, help='배치 작업에서 실패하는 요청 비율')
+    fakes.add_argument('--smtp-latency', type=float, default=0.05)
+    fakes.add_argument('--smtp-error-rate', type=float, default=0.0)
+
+    client = parser.add_argument_group('TubeLetter 설정')
+    client.add_argument('--client-rpm', type=int, default=1000, help='API 키/모델별 클라이언트 측 분당 요청 한도')
+    client.add_argument('--api-keys', type=int, default=1, help='Gemini API 키 수')
+    client.add_argument('--gemini-models', nargs='+', default=['gemini-bench', 'gemini-bench-lite'],
+                        help='모델 목록 (우선순위 순)')
+    client.add_argument('--free-tier', action='store_true', help='실제 무료 요금제 한도 사용 (매우 느림)')
+    client.add_argument('--batch-channels', type=float, default=0.0,
+                        help='batch 모드로 설정할 채널 비율 (제출한 요약은 다음 회차 실행에서 도착)')
+    client.add_argument('--batch-min-requests', type=int, default=10, help='배치 작업을 제출할 최소 요청 수')
+    client.add_argument('--retry-delay', type=float, default=0.5, help='429/자막/SMTP 재시도 기본 대기 시간 (초)')
+
+    output = parser.add_argument_group('출력')
+    output.add_argument('--json', metavar='PATH', help='결과를 JSON으로 저장')
+    output.add_argument('--tracemalloc', action='store_true', help='Python 힙 최대 사용량 측정 (처리량이 느려짐)')
+    output.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    output.add_argument('--keep-workdir', action='store_true', help='상태 파일이 있는 임시 작업 폴더를 지우지 않음')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level, format='%(message)s', stream=sys.stdout)
+    results = run_benchmark(args)
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+TubeLetter 시작 시간 벤치마크
+
+소스 실행, PyInstaller --onefile 빌드(tube.letter.spec), --onedir 빌드의
+시작 시간(프로세스 시작 ~ 종료)을 비교합니다.
+
+python bench/startup_benchmark.py --build           # 두 가지 빌드 생성 후 측정
+python bench/startup_benchmark.py --runs 20         # 이미 빌드된 파일로 측정
+python bench/startup_benchmark.py --args "--dry-run"
+"""
+import argparse
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXE_SUFFIX = '.exe' if os.name == 'nt' else ''
+ONEFILE_DIST = os.path.join(ROOT, 'dist', 'onefile')
+ONEDIR_DIST = os.path.join(ROOT, 'dist', 'onedir')
+
+def build():
+    """--onefile(스펙 파일 사용)과 --onedir 빌드를 각각 생성"""
+    print("🔨 --onefile 빌드 중 (tube.letter.spec)...")
+    subprocess.run(
+        [sys.executable, '-m', 'PyInstaller', '--noconfirm',
+         '--distpath', ONEFILE_DIST, '--workpath', os.path.join(ROOT, 'build', 'onefile'),
+         'tube.letter.spec'],
+        cwd=ROOT, check=True,
+    )
+    print("🔨 --onedir 빌드 중...")
+    subprocess.run(
+        [sys.executable, '-m', 'PyInstaller', '--noconfirm', '--onedir', '--name', 'tube.letter',
+         '--distpath', ONEDIR_DIST, '--workpath', os.path.join(ROOT, 'build', 'onedir'),
+         '--specpath', os.path.join(ROOT, 'build', 'onedir'),
+         os.path.join(ROOT, 'tube.letter.py')],
+        cwd=ROOT, check=True,
+    )
+
+def targets():
+    """측정 대상 (이름, 실행 명령) 목록 (빌드되지 않은 대상은 제외)"""
+    candidates = [
+        ('source', [sys.executable, os.path.join(ROOT, 'tube.letter.py')]),
+        ('onefile', [os.path.join(ONEFILE_DIST, f'tube.letter{EXE_SUFFIX}')]),
+        ('onedir', [os.path.join(ONEDIR_DIST, 'tube.letter', f'tube.letter{EXE_SUFFIX}')]),
+    ]
+    return [(name, command) for name, command in candidates if os.path.exists(command[-1])]
+
+def measure(command, runs):
+    """명령을 runs번 실행하여 각 실행 시간(밀리초) 리스트 반환"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='TubeLetter 시작 시간 벤치마크')
+    parser.add_argument('--build', action='store_true', help='측정 전에 onefile/onedir 빌드 생성')
+    parser.add_argument('--runs', type=int, default=10, help='대상별 실행 횟수 (기본값: 10)')
+    parser.add_argument('--args', default='--help', help='프로그램에 전달할 인자 (기본값: --help)')
+    args = parser.parse_args()
+
+    if args.build:
+        build()
+
+    program_args = shlex.split(args.args)
+    print(f"\n⏱ 시작 시간 측정: tube.letter {args.args} ({args.runs}회)")
+    print(f"{'대상':<10}{'최소':>10}{'중앙값':>10}{'최대':>10}  (ms)")
+    for name, command in targets():
+        # 첫 실행은 디스크 캐시 등의 영향을 받으므로 한 번 버림
+        measure(command + program_args, 1)
+        timings = measure(command + program_args, args.runs)
+        print(f"{name:<10}{min(timings):>10.0f}{statistics.median(timings):>10.0f}{max(timings):>10.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -3,57 +3,129 @@ python -m PyInstaller `
     --onefile  `
     --name="tube.letter" tube.letter.py
 """
-import feedparser
+# 무거운 외부 모듈(feedparser, google.genai, youtube_transcript_api, markdown, dotenv)은
+# 실제로 필요한 함수 안에서 불러옴 (--help, --dry-run, 새 영상이 없는 실행의 시작 시간 단축)
 import time
-from google import genai  # 변경: google.generativeai → google.genai
-from youtube_transcript_api import YouTubeTranscriptApi
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
-from dotenv import load_dotenv
+import sys
 import json
-import markdown  # pip install markdown
 from datetime import datetime, timedelta
-from dateutil import parser as date_parser  # pip install python-dateutil
+import urllib.request
+import urllib.error
+import hashlib
+import gzip
+import calendar
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import threading
+import sqlite3
+import html
+import argparse
+import random
+import logging
+import csv
+import io
+import re
+import heapq
+import abc
 
-# .env 파일에서 환경 변수 로드
-load_dotenv()
+log = logging.getLogger("tubeletter")
 
 # --- 설정 구간 ---
-DEBUG = True  # 디버깅 플래그 (True: 디버깅 메시지 출력, False: 숨김)
+DEBUG = True  # 디버깅 플래그 (True: 디버깅 메시지 출력, False: 숨김, --log-level로 변경 가능)
 HOURS_TO_CHECK = 24  # 최근 몇 시간 이내의 영상만 처리 (24시간 = 1일)
+FEED_FETCH_WORKERS = 8  # RSS 피드 동시 다운로드 개수
+FEED_FETCH_TIMEOUT = 15  # RSS 피드 하나당 최대 대기 시간 (초)
+TRANSCRIPT_WORKERS = 4  # 자막 추출 동시 작업 수
+SUMMARY_WORKERS = 2  # Gemini 요약 동시 요청 수
+PIPELINE_QUEUE_SIZE = 8  # 파이프라인 단계 사이 대기열 크기
+CHUNK_THRESHOLD_TOKENS = 30_000  # 자막이 이보다 길면 (추정 토큰 수) 나눠서 요약
+CHUNK_MAX_TOKENS = 12_000  # 분할 요약 시 조각 하나의 최대 토큰 수
+CHUNK_SUMMARY_WORKERS = 3  # 조각 요약 동시 요청 수
+DIGEST_MODE = False  # True: immediate 수신자 그룹도 실행마다 요약을 한 통의 다이제스트 이메일로 받음
+FEED_CACHE_FILE = 'feed_cache.json'  # 피드별 ETag/Last-Modified 및 영상 목록 캐시
+INCREMENTAL_FEED_SCAN = True  # True: 피드(최신순)를 이전 실행에서 확인한 영상/기간 밖 영상까지만 탐색
 
-# 환경 변수에서 민감 정보 불러오기
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-EMAIL_SENDER = os.getenv("EMAIL_SENDER")  # 보내는 이메일 (발신자)
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-EMAIL_RECIPIENTS = os.getenv("EMAIL_RECIPIENTS")  # 받는 이메일들 (쉼표로 구분)
-
-# 필수 환경 변수 검증
-if not all([GEMINI_API_KEY, EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECIPIENTS]):
-    print("❌ 오류: .env 파일에 다음 변수들이 설정되어야 합니다:")
-    if not GEMINI_API_KEY:
-        print("   - GEMINI_API_KEY")
-    if not EMAIL_SENDER:
-        print("   - EMAIL_SENDER (발신자 이메일)")
-    if not EMAIL_PASSWORD:
-        print("   - EMAIL_PASSWORD")
-    if not EMAIL_RECIPIENTS:
-        print("   - EMAIL_RECIPIENTS (수신자 이메일, 쉼표로 구분)")
-    print("\n💡 .env.example 파일을 참고하여 .env 파일을 생성하세요.")
-    exit(1)
-
-# 수신자 이메일 리스트 파싱 (쉼표로 구분된 문자열을 리스트로 변환)
-RECIPIENT_LIST = [email.strip() for email in EMAIL_RECIPIENTS.split(',') if email.strip()]
-
-if DEBUG:
-    print(f"📧 발신자: {EMAIL_SENDER}")
-    print(f"📬 수신자: {len(RECIPIENT_LIST)}명")
+# 환경 변수에서 불러오는 민감 정보 (main()에서 load_settings()로 채움)
+GEMINI_API_KEYS = []  # GEMINI_API_KEYS(쉼표로 구분)와 GEMINI_API_KEY를 합친 목록
+EMAIL_SENDER = None  # 보내는 이메일 (발신자)
+EMAIL_PASSWORD = None
+EMAIL_RECIPIENTS = None  # 받는 이메일들 (쉼표로 구분)
+RECIPIENT_LIST = []
+SMTP_HOST = "smtp.gmail.com"  # 로컬 테스트 서버(aiosmtpd 등)를 쓸 때 변경
+SMTP_PORT = 465
+SMTP_USE_SSL = True
+SMTP_TIMEOUT = 60  # SMTP 연결/명령 하나의 최대 대기 시간 (초, OUTBOX_SEND_LEASE_SECONDS보다 짧아야 중복 발송 방지)
+
+def _split_env_list(value):
+    """쉼표로 구분된 환경 변수 값을 리스트로 변환 (빈 항목과 중복 제외)"""
+    items = []
+    for item in value.split(','):
+        item = item.strip()
+        if item and item not in items:
+            items.append(item)
+    return items
+
+def load_settings(require_credentials=True, require_recipients=True):
+    """.env 파일과 환경 변수에서 설정 불러오기 (필수 값이 없으면 False 반환)
+
+    require_recipients가 False면 (수신자 그룹 설정에 수신자가 모두 있으면) EMAIL_RECIPIENTS가 없어도 됩니다.
+    """
+    global GEMINI_API_KEYS, GEMINI_MODELS, EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECIPIENTS, RECIPIENT_LIST
+    global SMTP_HOST, SMTP_PORT, SMTP_USE_SSL, SMTP_TIMEOUT
+    from dotenv import load_dotenv
+    
+    # .env 파일에서 환경 변수 로드
+    load_dotenv()
+    
+    # 환경 변수에서 민감 정보 불러오기
+    GEMINI_API_KEYS = _split_env_list(f'{os.getenv("GEMINI_API_KEY", "")},{os.getenv("GEMINI_API_KEYS", "")}')
+    GEMINI_MODELS = _split_env_list(os.getenv("GEMINI_MODELS", "")) or GEMINI_MODELS
+    EMAIL_SENDER = os.getenv("EMAIL_SENDER")
+    EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+    EMAIL_RECIPIENTS = os.getenv("EMAIL_RECIPIENTS")
+    SMTP_HOST = os.getenv("SMTP_HOST", SMTP_HOST)
+    SMTP_PORT = int(os.getenv("SMTP_PORT", str(SMTP_PORT)))
+    SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() in ("1", "true", "yes")
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", str(SMTP_TIMEOUT)))
+    
+    # 필수 환경 변수 검증
+    recipients_missing = require_recipients and not EMAIL_RECIPIENTS
+    if require_credentials and (not all([GEMINI_API_KEYS, EMAIL_SENDER, EMAIL_PASSWORD]) or recipients_missing):
+        # 빠진 변수 목록이 오류 수준에서도 보이도록 한 메시지로 기록
+        lines = ["❌ 오류: .env 파일에 다음 변수들이 설정되어야 합니다:"]
+        if not GEMINI_API_KEYS:
+            lines.append("   - GEMINI_API_KEY (여러 개일 경우 GEMINI_API_KEYS에 쉼표로 구분)")
+        if not EMAIL_SENDER:
+            lines.append("   - EMAIL_SENDER (발신자 이메일)")
+        if not EMAIL_PASSWORD:
+            lines.append("   - EMAIL_PASSWORD")
+        if recipients_missing:
+            lines.append(f"   - EMAIL_RECIPIENTS (수신자 이메일, 쉼표로 구분, {RECIPIENT_GROUPS_FILE}을 쓰면 생략 가능)")
+        lines.append("\n💡 .env.example 파일을 참고하여 .env 파일을 생성하세요.")
+        log.error("%s", "\n".join(lines))
+        return False
+    
+    # 수신자 이메일 리스트 파싱 (쉼표로 구분된 문자열을 리스트로 변환)
+    RECIPIENT_LIST = [email.strip() for email in (EMAIL_RECIPIENTS or '').split(',') if email.strip()]
+    
+    log.debug("🔑 Gemini API 키: %d개, 모델: %s", len(GEMINI_API_KEYS), ", ".join(GEMINI_MODELS))
+    log.debug("📧 발신자: %s", EMAIL_SENDER)
+    log.debug("📬 수신자: %d명", len(RECIPIENT_LIST))
     for i, recipient in enumerate(RECIPIENT_LIST, 1):
-        print(f"   {i}. {recipient}")
+        log.debug("   %d. %s", i, recipient)
+    return True
+
+# 사용할 Gemini 모델 (우선순위 순, 뒤쪽은 한도가 부족할 때 쓰는 저렴한 대체 모델, GEMINI_MODELS 환경 변수로 변경)
+GEMINI_MODELS = [
+    "gemini-2.5-flash",  # ⭐ 최신 2.5 버전 - 가장 빠르고 효율적 (강력 추천!)
+    "gemini-2.5-flash-lite",  # 더 저렴하고 한도가 넉넉한 대체 모델
+]
 
-# Gemini API 무료 요금제 한도
+# Gemini API 무료 요금제 한도 (API 키와 모델 조합마다 따로 적용)
 GEMINI_FREE_TIER_LIMITS = {
     "requests_per_minute": 15,           # 분당 요청 수
     "requests_per_day": 1500,            # 일일 요청 수
@@ -66,136 +138,500 @@ def pause(message="계속하려면 Enter를 누르세요..."):
     """사용자 입력을 기다리는 디버깅 함수"""
     input(f"\n⏸ {message}")
 
-# rss_feeds.txt에서 채널 ID를 읽어서 RSS 피드 URL 생성
-def load_rss_feeds(filepath='rss_feeds.txt'):
-    """rss_feeds.txt 파일에서 채널 ID를 읽어 RSS 피드 URL 리스트 생성"""
-    rss_feeds = []
-    encodings = ['utf-8', 'euc-kr', 'cp949', 'utf-16', 'latin-1']  # 인코딩 시도 순서
-    
-    for encoding in encodings:
-        try:
-            with open(filepath, 'r', encoding=encoding) as f:
-                print(f"💬 파일 인코딩: {encoding}")
-                for line in f:
-                    line = line.strip()
-                    # 빈 줄 무시
-                    if not line:
-                        continue
-                    # 채널 이름과 ID 분리 (형식: "채널명: 채널ID")
-                    if ':' in line:
-                        channel_id = line.split(':')[-1].strip()
-                    else:
-                        channel_id = line
-                    # 유효한 채널 ID인지 확인 (UC로 시작하고 길이가 24)
-                    if channel_id.startswith('UC') and len(channel_id) == 24:
-                        url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-                        rss_feeds.append(url)
-                        print(f"✓ 로드됨: {channel_id}")
-                    else:
-                        print(f"⚠ 무효한 채널 ID: {channel_id}")
-            return rss_feeds  # 성공하면 반환
-        except (UnicodeDecodeError, FileNotFoundError) as e:
-            if encoding == encodings[-1]:  # 마지막 인코딩도 실패
-                print(f"❌ {filepath} 파일을 읽을 수 없습니다. 시도된 인코딩: {', '.join(encodings)}")
-            continue
-        except Exception as e:
-            print(f"❌ 파일 읽기 중 오류 발생: {e}")
-            return rss_feeds
-    
-    return rss_feeds
+# 이미 요약한 영상 ID를 저장할 세트 (중복 방지)
+# 상태는 SQLite DB에 한 행씩 추가되며, 이전 버전의 processed_videos.json은 처음 실행 시 한 번만 DB로 가져옴
+STATE_DB_FILE = 'tubeletter.db'
+PROCESSED_VIDEOS_FILE = 'processed_videos.json'  # 이전 버전 캐시 파일
+PROCESSED_RETENTION_DAYS = 90  # 이 기간이 지난 처리 기록은 삭제 (HOURS_TO_CHECK보다 길어야 함)
+STATE_READ_ONLY = False  # True면 (--dry-run) 상태 DB를 메모리로 복사해서 쓰고 파일은 만들거나 바꾸지 않음
 
-# RSS 피드 로드
-RSS_FEEDS = load_rss_feeds('rss_feeds.txt')
+_state_db = None
+_state_lock = threading.Lock()  # 여러 작업자 스레드가 하나의 DB 연결을 공유
 
-if not RSS_FEEDS:
-    print("❌ 로드된 RSS 피드가 없습니다. rss_feeds.txt를 확인하세요.")
-elif DEBUG:
-    print(f"\n📊 디버깅: 총 {len(RSS_FEEDS)}개의 RSS 피드가 로드됨")
-    for i, feed in enumerate(RSS_FEEDS, 1):
-        print(f"  {i}. {feed}")
-    print()
+def get_state_db():
+    """상태 DB 연결 반환 (처음 호출 시 테이블 생성 및 이전 버전 파일 가져오기)"""
+    global _state_db
+    with _state_lock:
+        if _state_db is None:
+            if STATE_READ_ONLY:
+                db = _open_state_db_copy()
+            else:
+                # 다른 작업자 프로세스가 쓰는 중이면 잠시 기다림
+                db = sqlite3.connect(STATE_DB_FILE, check_same_thread=False, timeout=30)
+                db.execute("PRAGMA journal_mode=WAL")  # 쓰기 중 중단되어도 DB가 깨지지 않음
+                db.execute("PRAGMA synchronous=NORMAL")
+            _create_state_tables(db)
+            _migrate_processed_videos_json(db)
+            _state_db = db
+        return _state_db
 
-# Gemini 클라이언트 생성 (새 API 방식)
-client = genai.Client(api_key=GEMINI_API_KEY)
+def _open_state_db_copy():
+    """상태 DB 파일을 읽기 전용으로 열어 메모리 DB로 복사 (파일이 없으면 빈 메모리 DB)"""
+    db = sqlite3.connect(':memory:', check_same_thread=False)
+    if os.path.exists(STATE_DB_FILE):
+        source = sqlite3.connect(f"file:{urllib.request.pathname2url(os.path.abspath(STATE_DB_FILE))}?mode=ro", uri=True, timeout=30)
+        try:
+            source.backup(db)
+        finally:
+            source.close()
+    return db
 
-# Gemini 모델 설정 (사용 가능한 모델 자동 선택)
-def get_available_model():
-    """사용 가능한 Gemini 모델 확인"""
-    try:
-        models = [
-            "gemini-2.5-flash",  # ⭐ 최신 2.5 버전 - 가장 빠르고 효율적 (강력 추천!)
-        ]
-        for model_name in models:
-            try:
-                if DEBUG:
-                    print(f"🔍 모델 확인 중: {model_name}")
-                # 새 API에서는 모델 이름만 반환
-                print(f"✅ 사용할 모델: {model_name}")
-                return model_name
-            except Exception as e:
-                if DEBUG:
-                    print(f"  ❌ {model_name} 불가: {str(e)[:50]}")
-                continue
+def _create_state_tables(db):
+    """상태 DB 테이블 생성 (이전 버전 DB에는 없는 열 추가)"""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS processed_videos (
+            video_id TEXT PRIMARY KEY,
+            channel TEXT,
+            published TEXT,
+            status TEXT,
+            processed_at REAL
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_processed_at ON processed_videos(processed_at)")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject TEXT,
+            body TEXT,
+            html TEXT,
+            recipients TEXT,
+            video_ids TEXT,
+            status TEXT,
+            attempts INTEGER,
+            next_attempt_at REAL,
+            last_error TEXT,
+            created_at REAL,
+            sent_at REAL
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS digest_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_name TEXT,
+            video_id TEXT,
+            video TEXT,
+            added_at REAL
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_digest_group ON digest_items(group_name, id)")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS recipient_group_state (
+            group_name TEXT PRIMARY KEY,
+            last_sent_at REAL
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS video_leases (
+            video_id TEXT PRIMARY KEY,
+            worker_id TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id TEXT PRIMARY KEY,
+            name TEXT,
+            priority INTEGER NOT NULL,
+            poll_interval INTEGER NOT NULL,
+            enabled INTEGER NOT NULL,
+            source TEXT,
+            added_at REAL,
+            mode TEXT NOT NULL DEFAULT 'realtime'
+        )
+    """)
+    # 이전 버전 DB에는 요약 방식(mode) 열이 없음
+    if 'mode' not in {row[1] for row in db.execute("PRAGMA table_info(channels)")}:
+        db.execute("ALTER TABLE channels ADD COLUMN mode TEXT NOT NULL DEFAULT 'realtime'")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS batch_requests (
+            video_id TEXT PRIMARY KEY,
+            video TEXT,
+            prompt TEXT,
+            cache_key TEXT,
+            status TEXT,
+            job_name TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL,
+            updated_at REAL
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_batch_status ON batch_requests(status, job_name)")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS migrations (
+            name TEXT PRIMARY KEY,
+            done_at REAL
+        )
+    """)
+    db.commit()
 
-        print("❌ 사용 가능한 Gemini 모델을 찾을 수 없습니다.")
-        print("   https://ai.google.dev/gemini-api/docs/models/gemini 에서 사용 가능한 모델을 확인하세요.")
-        return None
-    except Exception as e:
-        print(f"❌ 모델 확인 중 오류: {e}")
-        return None
+def _migration_done(db, name):
+    """이전 버전 파일을 이미 가져왔는지 확인"""
+    return db.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone() is not None
 
-model_name = get_available_model()
-if not model_name:
-    print("❌ 프로그램을 종료합니다.")
-    exit(1)
+def _record_migration(db, name):
+    db.execute("INSERT OR IGNORE INTO migrations (name, done_at) VALUES (?, ?)", (name, time.time()))
 
-# 이미 요약한 영상 ID를 저장할 세트 (중복 방지)
-PROCESSED_VIDEOS_FILE = 'processed_videos.json'
+def _migrate_processed_videos_json(db):
+    """이전 버전의 processed_videos.json 내용을 DB로 한 번만 가져옴 (파일은 그대로 둠)"""
+    if not os.path.exists(PROCESSED_VIDEOS_FILE) or _migration_done(db, PROCESSED_VIDEOS_FILE):
+        return
+    try:
+        with open(PROCESSED_VIDEOS_FILE, 'r', encoding='utf-8') as f:
+            video_ids = json.load(f)
+        now = time.time()
+        with db:
+            db.executemany(
+                "INSERT OR IGNORE INTO processed_videos (video_id, status, processed_at) VALUES (?, 'migrated', ?)",
+                [(video_id, now) for video_id in video_ids],
+            )
+            _record_migration(db, PROCESSED_VIDEOS_FILE)
+        log.info("📦 %s에서 %d개의 처리 기록을 %s로 이전", PROCESSED_VIDEOS_FILE, len(video_ids), STATE_DB_FILE)
+    except Exception as e:
+        log.warning("⚠ 이전 캐시 이전 실패: %s", e)
 
 def load_processed_videos():
-    """파일에서 처리된 영상 ID 불러오기"""
+    """DB에서 처리된 영상 ID 불러오기"""
     try:
-        with open(PROCESSED_VIDEOS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if DEBUG:
-                print(f"📂 캐시 로드: {len(data)}개의 처리된 영상")
-            return set(data)
-    except FileNotFoundError:
-        if DEBUG:
-            print("📂 캐시 파일 없음, 새로 생성")
-        return set()
+        db = get_state_db()
+        with _state_lock:
+            data = {row[0] for row in db.execute("SELECT video_id FROM processed_videos")}
+        log.debug("📂 캐시 로드: %d개의 처리된 영상", len(data))
+        return data
     except Exception as e:
-        print(f"⚠ 캐시 로드 실패: {e}")
+        log.warning("⚠ 캐시 로드 실패: %s", e)
         return set()
 
-def save_processed_videos(processed_videos):
-    """처리된 영상 ID를 파일에 저장"""
+def _record_processed_video(db, video, status):
+    """처리 기록 한 행 추가 및 임대 삭제 (호출하는 쪽의 트랜잭션 안에서 실행)"""
+    db.execute(
+        "INSERT OR REPLACE INTO processed_videos (video_id, channel, published, status, processed_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (video['video_id'], video.get('channel_name'), video.get('published'), status, time.time()),
+    )
+    db.execute("DELETE FROM video_leases WHERE video_id = ?", (video['video_id'],))
+
+def mark_video_processed(video, status):
+    """처리 완료된 영상을 DB와 세트에 기록 (저장에 실패하면 예외가 그대로 전달되어 처리되지 않은 것으로 남음)"""
+    db = get_state_db()
+    with _state_lock, db:
+        _record_processed_video(db, video, status)
+    processed_videos.add(video['video_id'])
+    log.debug("💾 캐시 저장: %s (%s)", video['video_id'], status)
+
+def prune_processed_videos(retention_days=PROCESSED_RETENTION_DAYS):
+    """보관 기간이 지난 처리 기록 삭제 (시간 필터에 걸러지는 영상이므로 다시 처리되지 않음)"""
+    retention_days = max(retention_days, HOURS_TO_CHECK / 24 + 1)
     try:
-        with open(PROCESSED_VIDEOS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(list(processed_videos), f, indent=2)
-        if DEBUG:
-            print(f"💾 캐시 저장: {len(processed_videos)}개")
+        db = get_state_db()
+        with _state_lock, db:
+            removed = db.execute(
+                "DELETE FROM processed_videos WHERE processed_at < ?",
+                (time.time() - retention_days * 86400,),
+            ).rowcount
+        if removed:
+            log.debug("🧹 오래된 처리 기록 정리: %d개 삭제", removed)
+        return removed
     except Exception as e:
-        print(f"⚠ 캐시 저장 실패: {e}")
+        log.warning("⚠ 처리 기록 정리 실패: %s", e)
+        return 0
 
-# 프로그램 시작 시 캐시 로드
-processed_videos = load_processed_videos()
+processed_videos = set()  # main()에서 load_processed_videos()로 채움
 
-def get_transcript(video_id):
-    """자막 추출 함수"""
+# --- 작업자 분산 (채널 샤드, 영상 임대) ---
+# 여러 프로세스/호스트가 같은 상태 DB를 쓰며 나눠 실행할 수 있음
+# - --shard I/N: 채널 ID 해시로 채널을 N개로 나눠 그중 I번째만 확인 (피드 캐시 등 채널별 상태 파일과 한도도 샤드별로 나눔)
+# - 새 영상은 요약 전에 video_leases 테이블에서 만료 시간이 있는 임대를 얻어야 처리 (이미 처리됐거나 다른 작업자가
+#   임대 중이면 건너뜀). 작업자가 비정상 종료하면 갱신이 멈춘 임대가 만료되어 다른 작업자가 다시 가져감
+WORKER_SHARD_INDEX = 0  # 이 작업자가 맡은 샤드 번호 (--shard로 변경)
+WORKER_SHARD_COUNT = 1  # 전체 샤드 수
+VIDEO_LEASE_SECONDS = 900  # 영상 임대 유효 시간 (초, 작업 중에는 계속 연장됨)
+LEASE_HEARTBEAT_INTERVAL = 60  # 임대 연장 간격 (초, VIDEO_LEASE_SECONDS보다 충분히 짧아야 함)
+
+def parse_shard(value):
+    """--shard 값 "I/N" 해석 ((I, N) 반환)"""
     try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['ko', 'en'])
-        return " ".join([i['text'] for i in transcript_list])
-    except:
-        return None
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'I/N' 형식이어야 합니다: {value}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"0 <= I < N 이어야 합니다: {value}")
+    return index, count
+
+def channel_shard(channel_id, shard_count):
+    """채널이 속한 샤드 번호 (프로세스/호스트가 달라도 같은 값이 나오도록 해시 사용)"""
+    return int(hashlib.sha256(channel_id.encode('utf-8')).hexdigest()[:8], 16) % shard_count
+
+def filter_shard_channels(channels):
+    """이 작업자의 샤드에 속한 채널만 반환"""
+    if WORKER_SHARD_COUNT <= 1:
+        return channels
+    return [channel for channel in channels
+            if channel_shard(channel['channel_id'], WORKER_SHARD_COUNT) == WORKER_SHARD_INDEX]
+
+def shard_state_file(filepath):
+    """샤드별 상태 파일 경로 (feed_cache.json → feed_cache.shard0of4.json)"""
+    if WORKER_SHARD_COUNT <= 1:
+        return filepath
+    root, ext = os.path.splitext(filepath)
+    return f"{root}.shard{WORKER_SHARD_INDEX}of{WORKER_SHARD_COUNT}{ext}"
+
+class VideoLeases:
+    """상태 DB의 video_leases 테이블로 영상 처리 권한을 작업자 하나에만 부여
+
+    claim()은 처리 기록이 없고 임대가 없거나 만료된 영상만 가져오며, 작업 중인 임대는 별도 스레드가
+    LEASE_HEARTBEAT_INTERVAL마다 연장합니다. 처리가 끝난 영상의 임대는 처리 기록과 같은 트랜잭션에서 지워지고,
+    남은 임대(연기된 영상)는 release_all()로 돌려줍니다.
+    """
+
+    def __init__(self, worker_id=None, lease_seconds=VIDEO_LEASE_SECONDS):
+        import socket
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.claimed_elsewhere = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def claim(self, video_id):
+        """영상 처리 권한 얻기 (다른 작업자가 처리했거나 임대 중이면 False)"""
+        db = get_state_db()
+        now = time.time()
+        with _state_lock, db:
+            # 처리 기록 확인과 임대를 한 문장으로 (그 사이에 다른 작업자가 처리를 끝내도 중복 처리 없음)
+            claimed = db.execute(
+                "INSERT INTO video_leases (video_id, worker_id, expires_at) "
+                "SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM processed_videos WHERE video_id = ?) "
+                "ON CONFLICT(video_id) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at "
+                "WHERE video_leases.expires_at < ? OR video_leases.worker_id = excluded.worker_id",
+                (video_id, self.worker_id, now + self.lease_seconds, video_id, now),
+            ).rowcount == 1
+            if not claimed and db.execute("SELECT 1 FROM processed_videos WHERE video_id = ?", (video_id,)).fetchone():
+                processed_videos.add(video_id)  # 이 실행이 시작된 뒤 다른 작업자가 처리함
+        if not claimed:
+            self.claimed_elsewhere += 1
+            log.debug("   🔒 다른 작업자가 처리 중이거나 처리함: %s", video_id)
+        return claimed
+
+    def renew(self):
+        """이 작업자의 임대를 모두 연장"""
+        db = get_state_db()
+        with _state_lock, db:
+            db.execute("UPDATE video_leases SET expires_at = ? WHERE worker_id = ?",
+                       (time.time() + self.lease_seconds, self.worker_id))
+
+    def release_all(self):
+        """이 작업자의 남은 임대와 오래전에 만료된 임대 삭제 (연기된 영상은 다른 작업자도 가져갈 수 있음)"""
+        db = get_state_db()
+        with _state_lock, db:
+            db.execute("DELETE FROM video_leases WHERE worker_id = ? OR expires_at < ?",
+                       (self.worker_id, time.time() - self.lease_seconds))
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.stop()  # 이전 실행이 오류로 중단되어 남은 임대
+        self.claimed_elsewhere = 0
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.release_all()
+
+    def _heartbeat(self):
+        while not self.stop_event.wait(LEASE_HEARTBEAT_INTERVAL):
+            try:
+                self.renew()
+            except Exception as e:
+                log.warning("⚠ 영상 임대 연장 실패: %s", e)
+
+# 영상 임대 관리자 (main()에서 생성, 드라이런에서는 사용하지 않음)
+video_leases = None
+
+# --- 구독 채널 목록 ---
+# 채널은 상태 DB의 channels 테이블에 (이름, 우선순위, 확인 간격, 사용 여부)와 함께 저장되어 시작 시 한 번의 조회로 불러옴
+# Google Takeout의 구독정보.csv(또는 Takeout zip 파일)를 --import-subscriptions로 가져오며,
+# 이전 버전의 rss_feeds.txt는 처음 실행 시 한 번만 채널 목록으로 가져옴
+RSS_FEEDS_FILE = 'rss_feeds.txt'  # 이전 버전 채널 목록 파일 ("채널명: 채널ID" 형식)
+FEED_URL_TEMPLATE = "https://www.youtube.com/feeds/videos.xml?channel_id={}"
+CHANNEL_DEFAULT_PRIORITY = 0  # 높을수록 먼저 확인
+CHANNEL_DEFAULT_POLL_INTERVAL = 3600  # 채널 확인 간격 (초)
+CHANNEL_MODES = ('realtime', 'batch')  # 요약 방식: 바로 요약 / Gemini 배치 작업으로 모아서 요약 (급하지 않은 채널)
+CHANNEL_DEFAULT_MODE = 'realtime'
+_CHANNEL_ID_PATTERN = re.compile(r'UC[A-Za-z0-9_-]{22}')
+
+def read_rss_feeds_txt(filepath=RSS_FEEDS_FILE):
+    """rss_feeds.txt에서 (채널 ID, 채널명) 목록 읽기 (이전 버전 파일이므로 여러 인코딩 시도)"""
+    encodings = ['utf-8', 'euc-kr', 'cp949', 'utf-16', 'latin-1']  # 인코딩 시도 순서
+    for encoding in encodings:
+        try:
+            with open(filepath, 'r', encoding=encoding) as f:
+                lines = f.read().splitlines()
+            log.debug("💬 파일 인코딩: %s", encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError(f"{filepath} 파일을 읽을 수 없습니다. 시도된 인코딩: {', '.join(encodings)}")
+    channels = []
+    for line in lines:
+        line = line.strip()
+        # 빈 줄 무시
+        if not line:
+            continue
+        # 채널 이름과 ID 분리 (형식: "채널명: 채널ID")
+        name, _, channel_id = line.rpartition(':')
+        channels.append((channel_id.strip(), name.strip()))
+    return channels
 
-def send_email(subject, body):
-    """이메일 발송 함수 (HTML 지원, 다중 수신자)"""
-    # 마크다운을 HTML로 변환
-    html_body = markdown.markdown(body, extensions=['nl2br', 'tables'])
+def _parse_subscription_csv(text):
+    """Takeout 구독정보 CSV(채널 ID, 채널 URL, 채널 제목)에서 (채널 ID, 채널 제목) 목록 추출"""
+    channels = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not row[0].strip():
+            continue
+        # 머리글 행은 언어에 따라 다르므로("채널 ID" / "Channel Id") 열 순서로 읽음
+        if row[0].strip() in ('채널 ID', 'Channel Id', 'Channel ID'):
+            continue
+        channels.append((row[0].strip(), row[2].strip() if len(row) > 2 else ''))
+    return channels
+
+def read_takeout_subscriptions(filepath):
+    """Google Takeout 구독정보.csv 또는 Takeout zip에서 (채널 ID, 채널 제목) 목록 읽기"""
+    import zipfile  # 가져오기 명령에서만 필요
+    if zipfile.is_zipfile(filepath):
+        channels = []
+        with zipfile.ZipFile(filepath) as archive:
+            # 예: Takeout/YouTube 및 YouTube Music/구독정보/구독정보.csv (영어: subscriptions/subscriptions.csv)
+            names = [
+                name for name in archive.namelist()
+                if name.lower().endswith('.csv') and ('구독정보' in name or 'subscriptions' in name.lower())
+            ]
+            if not names:
+                raise ValueError(f"{filepath}에서 구독정보 CSV를 찾을 수 없습니다.")
+            for name in names:
+                channels.extend(_parse_subscription_csv(archive.read(name).decode('utf-8-sig')))
+        return channels
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        return _parse_subscription_csv(f.read())
+
+def import_subscriptions(filepath, priority=CHANNEL_DEFAULT_PRIORITY, poll_interval=CHANNEL_DEFAULT_POLL_INTERVAL,
+                         mode=CHANNEL_DEFAULT_MODE):
+    """구독 목록 파일(.csv, Takeout .zip, rss_feeds.txt)을 채널 목록에 추가
+
+    이미 있는 채널은 이름만 갱신하고 우선순위/확인 간격/사용 여부/요약 방식은 유지합니다.
+    반환값: (추가된 채널 수, 갱신된 채널 수, 무효한 항목 수)
+    """
+    if filepath.lower().endswith('.txt'):
+        entries = read_rss_feeds_txt(filepath)
+    else:
+        entries = read_takeout_subscriptions(filepath)
+    
+    # 유효한 채널 ID만 남기고 중복 제거 (UC로 시작하는 24자)
+    channels = {}
+    invalid = 0
+    for channel_id, name in entries:
+        if not _CHANNEL_ID_PATTERN.fullmatch(channel_id):
+            log.warning("⚠ 무효한 채널 ID: %s", channel_id)
+            invalid += 1
+            continue
+        channels[channel_id] = name or channels.get(channel_id) or None
     
-    # HTML 스타일 추가
-    html_content = f"""
+    source = os.path.basename(filepath)
+    now = time.time()
+    db = get_state_db()
+    with _state_lock, db:
+        existing = {row[0] for row in db.execute("SELECT channel_id FROM channels")}
+        db.executemany(
+            "INSERT INTO channels (channel_id, name, priority, poll_interval, enabled, source, added_at, mode) "
+            "VALUES (?, ?, ?, ?, 1, ?, ?, ?) "
+            "ON CONFLICT(channel_id) DO UPDATE SET name = COALESCE(excluded.name, channels.name)",
+            [(channel_id, name, priority, poll_interval, source, now, mode) for channel_id, name in channels.items()],
+        )
+    added = len(channels.keys() - existing)
+    return added, len(channels) - added, invalid
+
+def _migrate_rss_feeds_txt():
+    """채널 목록이 비어 있으면 이전 버전의 rss_feeds.txt 채널을 한 번만 가져옴 (파일은 그대로 둠)"""
+    if not os.path.exists(RSS_FEEDS_FILE):
+        return
+    db = get_state_db()
+    with _state_lock:
+        if _migration_done(db, RSS_FEEDS_FILE):
+            return
+        has_channels = db.execute("SELECT 1 FROM channels LIMIT 1").fetchone() is not None
+    try:
+        if not has_channels:
+            added, _, _ = import_subscriptions(RSS_FEEDS_FILE)
+            log.info("📦 %s에서 %s개의 채널을 %s로 가져옴", RSS_FEEDS_FILE, added, STATE_DB_FILE)
+        with _state_lock, db:
+            _record_migration(db, RSS_FEEDS_FILE)
+    except Exception as e:
+        log.warning("⚠ %s 이전 실패: %s", RSS_FEEDS_FILE, e)
+
+def load_channels():
+    """사용 중인 채널 목록 불러오기 (우선순위 높은 순, 같으면 추가된 순)"""
+    _migrate_rss_feeds_txt()
+    db = get_state_db()
+    with _state_lock:
+        rows = db.execute(
+            "SELECT channel_id, name, priority, poll_interval, mode FROM channels "
+            "WHERE enabled = 1 ORDER BY priority DESC, rowid"
+        ).fetchall()
+    return [
+        {
+            'channel_id': channel_id,
+            'name': name,
+            'priority': priority,
+            'poll_interval': poll_interval,
+            'mode': mode,
+            'feed_url': FEED_URL_TEMPLATE.format(channel_id),
+        }
+        for channel_id, name, priority, poll_interval, mode in rows
+    ]
+
+def update_channel(channel_id, **fields):
+    """채널의 name/priority/poll_interval/enabled/mode 값 변경 (채널이 없으면 False 반환)"""
+    columns = [column for column in ('name', 'priority', 'poll_interval', 'enabled', 'mode') if column in fields]
+    if not columns:
+        return False
+    db = get_state_db()
+    with _state_lock, db:
+        updated = db.execute(
+            f"UPDATE channels SET {', '.join(f'{column} = ?' for column in columns)} WHERE channel_id = ?",
+            [fields[column] for column in columns] + [channel_id],
+        ).rowcount
+    return updated > 0
+
+def print_channels():
+    """채널 목록을 표 형태로 출력 (비활성화된 채널 포함)"""
+    _migrate_rss_feeds_txt()
+    db = get_state_db()
+    with _state_lock:
+        rows = db.execute(
+            "SELECT channel_id, name, priority, poll_interval, enabled, mode FROM channels ORDER BY priority DESC, rowid"
+        ).fetchall()
+    # 명령 결과이므로 --log-level과 관계없이 표준 출력으로 출력
+    print(f"📺 채널 {len(rows)}개 (사용 중 {sum(1 for row in rows if row[4])}개)")
+    for channel_id, name, priority, poll_interval, enabled, mode in rows:
+        print(f"  {'✓' if enabled else '✗'} {channel_id}  우선순위 {priority:>3}  간격 {poll_interval:>6}초  "
+              f"{mode:<8}  {name or ''}")
+
+# 채널 목록 (main()에서 load_channels()로 채움)
+CHANNELS = []
+RSS_FEEDS = []  # CHANNELS의 피드 URL
+
+def render_markdown(body):
+    """마크다운을 HTML로 변환"""
+    import markdown  # pip install markdown
+    return markdown.markdown(body, extensions=['nl2br', 'tables'])
+
+def wrap_html(html_body):
+    """HTML 본문에 이메일용 스타일 추가"""
+    return f"""
     <html>
     <head>
         <style>
@@ -204,6 +640,8 @@ def send_email(subject, body):
             ul, ol {{ margin-left: 20px; }}
             strong {{ color: #e74c3c; }}
             code {{ background-color: #f4f4f4; padding: 2px 5px; border-radius: 3px; }}
+            .toc {{ background-color: #f8f9fa; padding: 10px 20px; border-radius: 5px; }}
+            .video {{ border-top: 2px solid #2c3e50; margin-top: 30px; padding-top: 10px; }}
         </style>
     </head>
     <body>
@@ -211,12 +649,15 @@ def send_email(subject, body):
     </body>
     </html>
     """
-    
-    # Multipart 메시지 생성
+
+def build_message(subject, body, html_content, recipients=None):
+    """텍스트와 HTML 버전을 모두 담은 Multipart 메시지 생성"""
     msg = MIMEMultipart('alternative')
+    recipients = recipients or RECIPIENT_LIST
     msg['Subject'] = subject
     msg['From'] = EMAIL_SENDER
-    msg['To'] = ', '.join(RECIPIENT_LIST)  # 여러 수신자를 쉼표로 연결
+    # 여러 명에게 보낼 때는 서로의 주소가 보이지 않도록 수신자는 봉투(to_addrs)에만 넣음
+    msg['To'] = recipients[0] if len(recipients) == 1 else 'undisclosed-recipients:;'
     
     # 텍스트와 HTML 버전 모두 추가
     part1 = MIMEText(body, 'plain', 'utf-8')
@@ -224,270 +665,2684 @@ def send_email(subject, body):
     
     msg.attach(part1)
     msg.attach(part2)
-    
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
+    return msg
+
+def open_smtp_connection():
+    """SMTP_HOST/SMTP_PORT로 연결하고 로그인 (서버가 인증을 지원하지 않으면 로그인 생략)
+
+    서버가 SMTP_TIMEOUT초 안에 응답하지 않으면 socket.timeout(OSError)이 발생하여 재시도 대상이 됩니다.
+    """
+    if SMTP_USE_SSL:
+        server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    else:
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    server.ehlo()
+    if server.has_extn('auth'):
         server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        server.send_message(msg)
-    
-    if DEBUG:
-        print(f"   📧 이메일 발송: {EMAIL_SENDER} → {len(RECIPIENT_LIST)}명")
+    return server
 
-def process_youtube_automation():
-    # 모든 피드 처리 (DEBUG 모드 상관없이)
-    feeds_to_process = RSS_FEEDS
-    
-    # 시간 기준 설정 (현재 시각 - HOURS_TO_CHECK)
-    time_threshold = datetime.now(datetime.now().astimezone().tzinfo) - timedelta(hours=HOURS_TO_CHECK)
-    
-    if DEBUG:
-        print(f"⏰ 시간 필터: {HOURS_TO_CHECK}시간 이내 ({time_threshold.strftime('%Y-%m-%d %H:%M:%S')} 이후)")
-    
-    total_processed = 0  # 처리된 영상 수
-    total_skipped_old = 0  # 오래된 영상 스킵 수
-    total_skipped_cached = 0  # 캐시된 영상 스킵 수
-    
-    for feed_url in feeds_to_process:
+# --- 이메일 발송 대기열 (outbox) ---
+# 요약이 끝난 이메일은 먼저 DB의 outbox 테이블에 저장되고, 별도 작업자가 SMTP 연결을 재사용하며 발송함
+# (SMTP 서버가 느리거나 실패해도 요약은 잃어버리지 않고 다음 시도/실행에서 다시 발송)
+SMTP_MAX_MESSAGES_PER_CONNECTION = 20  # 연결 하나로 보낼 최대 이메일 수 (초과 시 다시 연결)
+SMTP_IDLE_TIMEOUT = 30  # 보낼 이메일이 없는 상태가 이보다 길어지면 SMTP 연결 종료 (초)
+OUTBOX_MAX_ATTEMPTS = 5  # 발송 실패 시 최대 시도 횟수 (초과하면 failed 상태로 보관)
+OUTBOX_RETRY_BASE_DELAY = 30  # 재시도 기본 대기 시간 (초, 시도마다 2배)
+OUTBOX_POLL_INTERVAL = 1  # 발송할 이메일이 없을 때 대기열 확인 간격 (초)
+OUTBOX_SEND_LEASE_SECONDS = 300  # 발송 중(sending)으로 가져간 이메일을 작업자가 종료되면 다시 보낼 때까지의 시간 (초)
+OUTBOX_FINISH_TIMEOUT = 300  # 실행을 마칠 때 남은 이메일 발송을 기다리는 최대 시간 (초, 나머지는 다음 실행에서 발송)
+
+def _insert_outbox(db, subject, body, html_content, video_ids, recipients):
+    cursor = db.execute(
+        "INSERT INTO outbox (subject, body, html, recipients, video_ids, status, attempts, "
+        "next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, 'pending', 0, ?, ?)",
+        (subject, body, html_content, json.dumps(recipients or RECIPIENT_LIST),
+         json.dumps(video_ids), time.time(), time.time()),
+    )
+    return cursor.lastrowid
+
+def _update_video_status(video_ids, status):
+    """처리 기록의 발송 상태 변경 (queued → sent/failed)"""
+    db = get_state_db()
+    with _state_lock, db:
+        db.executemany(
+            "UPDATE processed_videos SET status = ? WHERE video_id = ?",
+            [(status, video_id) for video_id in video_ids],
+        )
+
+def count_pending_emails():
+    """아직 발송되지 않은 대기열 이메일 수"""
+    db = get_state_db()
+    with _state_lock:
+        return db.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+
+class OutboxWorker:
+    """발송 대기열을 비우는 작업자 스레드 (SMTP 연결 재사용, 실패 시 지수 백오프)"""
+
+    def __init__(self, max_messages_per_connection=SMTP_MAX_MESSAGES_PER_CONNECTION):
+        self.max_messages_per_connection = max_messages_per_connection
+        self.server = None
+        self.sent_on_connection = 0
+        self.last_sent_at = 0.0  # 현재 연결로 마지막 이메일을 보낸 시각 (time.monotonic)
+        self.sent_count = 0
+        self.failed_count = 0
+        self.finishing = threading.Event()
+        self.stopping = False  # finish()가 시간 초과로 먼저 반환되면 새 이메일을 가져오지 않음
+        self.thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def finish(self, timeout=OUTBOX_FINISH_TIMEOUT):
+        """현재 발송 가능한 이메일을 모두 보낸 뒤 종료 (재시도 대기 중인 이메일은 다음 실행으로)
+
+        timeout초가 지나도 끝나지 않으면 기다리지 않고 반환합니다. 작업자는 보내던 이메일까지만 보내고
+        종료되며, 남은 이메일은 대기열에 그대로 남아 다음 실행에서 발송됩니다.
+        """
+        self.finishing.set()
+        deadline = time.monotonic() + timeout
+        while self.thread.is_alive():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stopping = True
+                log.warning("⚠ 이메일 발송이 %s초 안에 끝나지 않아 남은 이메일은 다음 실행에서 발송", timeout)
+                return
+            self.thread.join(timeout=min(0.5, remaining))
+
+    def _run(self):
         try:
-            feed = feedparser.parse(feed_url)
-            channel_name = feed.feed.title if hasattr(feed.feed, 'title') else 'Unknown'
-            
-            if DEBUG:
-                print(f"\n{'='*60}")
-                print(f"📡 채널: {channel_name}")
-                print(f"   피드: {feed_url[:60]}...")
-                print(f"   총 {len(feed.entries)}개의 영상 발견")
-            
-            channel_processed = 0
-            
-            for entry in feed.entries:
-                try:
-                    video_id = entry.yt_videoid
-                    
-                    # 1. 캐시 확인 (이미 처리한 영상)
-                    if video_id in processed_videos:
-                        total_skipped_cached += 1
-                        if DEBUG:
-                            print(f"   ⏭ 스킵 (캐시됨): {entry.title[:50]}...")
-                        continue
-                    
-                    # 2. 게시 시간 확인 (최근 HOURS_TO_CHECK 시간 이내인지)
-                    try:
-                        # RSS 피드의 published 또는 updated 시간 파싱
-                        if hasattr(entry, 'published_parsed'):
-                            pub_time = datetime(*entry.published_parsed[:6])
-                        elif hasattr(entry, 'updated_parsed'):
-                            pub_time = datetime(*entry.updated_parsed[:6])
-                        else:
-                            # 시간 정보가 없으면 처리 (안전장치)
-                            pub_time = datetime.now()
-                        
-                        # 타임존 추가 (naive datetime을 aware datetime으로 변환)
-                        if pub_time.tzinfo is None:
-                            pub_time = pub_time.replace(tzinfo=time_threshold.tzinfo)
-                        
-                        # 시간 비교
-                        if pub_time < time_threshold:
-                            total_skipped_old += 1
-                            if DEBUG:
-                                age_hours = (datetime.now(time_threshold.tzinfo) - pub_time).total_seconds() / 3600
-                                print(f"   ⏭ 스킵 (오래됨): {entry.title[:50]}... ({age_hours:.1f}시간 전)")
-                            continue
-                    
-                    except Exception as time_error:
-                        if DEBUG:
-                            print(f"   ⚠ 시간 파싱 실패, 영상 처리 계속: {time_error}")
-                    
-                    # 3. 새 영상 처리
-                    print(f"\n{'─'*60}")
-                    print(f"🎥 새 영상 발견: {entry.title}")
-                    print(f"   📺 채널: {channel_name}")
-                    print(f"   📌 Video ID: {video_id}")
-                    print(f"   🔗 Link: {entry.link}")
-                    if hasattr(entry, 'published'):
-                        print(f"   📅 게시: {entry.published}")
-                    
-                    # 4. 자막 가져오기
-                    print(f"   ⏳ 자막 추출 중...")
-                    transcript = get_transcript(video_id)
-                    if transcript:
-                        print(f"   ✅ 자막 추출 성공 (길이: {len(transcript)}자)")
-                        content_to_analyze = transcript
-                    else:
-                        print(f"   ⚠ 자막 없음, 제목/설명으로 진행")
-                        content_to_analyze = f"제목: {entry.title}\n설명: {entry.summary}"
-                        
-                        # 5. Gemini 요약 (새 API 사용)
-                        print(f"   ⏳ Gemini 요약 생성 중...")
-                        prompt = f"""다음 유튜브 영상의 내용을 상세하게 분석하고 요약해줘.
+            while not self.stopping:
+                message = self._next_due_message()
+                if message is None:
+                    if self.finishing.is_set():
+                        return
+                    # 요약은 몇 초 간격으로 도착하므로 잠시 비었다고 바로 끊지 않고, 오래 비어 있을 때만 연결 종료
+                    if self.server is not None and time.monotonic() - self.last_sent_at > SMTP_IDLE_TIMEOUT:
+                        self._close_connection()
+                    self.finishing.wait(OUTBOX_POLL_INTERVAL)
+                    continue
+                self._deliver(message)
+        finally:
+            self._close_connection()
 
-[요약 지침]
-1. 영상의 핵심 주제와 배경을 명확히 설명
-2. 주요 논점을 3-5개의 섹션으로 구조화 (번호 매기기)
-3. 각 섹션마다 구체적인 내용과 근거 포함
-4. 중요한 발언, 수치, 날짜 등은 반드시 언급
-5. 결론 또는 시사점 추가
-6. 전문적이고 상세하게 작성 (최소 500자 이상)
+    def _next_due_message(self):
+        """발송할 때가 된 이메일 하나를 sending 상태로 가져옴 (다른 작업자 프로세스와 중복 발송 방지)
 
-[영상 제목]
-{entry.title}
+        비정상 종료된 작업자가 가져간 이메일은 OUTBOX_SEND_LEASE_SECONDS 후 다시 가져올 수 있습니다.
+        """
+        db = get_state_db()
+        while True:
+            now = time.time()
+            with _state_lock, db:
+                message = db.execute(
+                    "SELECT id, subject, body, html, recipients, video_ids, attempts, status, next_attempt_at FROM outbox "
+                    "WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if message is None:
+                    return None
+                # 읽은 뒤 다른 작업자가 먼저 가져갔으면 갱신되는 행이 없음
+                claimed = db.execute(
+                    "UPDATE outbox SET status = 'sending', next_attempt_at = ? "
+                    "WHERE id = ? AND status = ? AND next_attempt_at = ?",
+                    (now + OUTBOX_SEND_LEASE_SECONDS, message[0], message[7], message[8]),
+                ).rowcount == 1
+            if claimed:
+                return message[:7]
 
-[영상 내용]
-{content_to_analyze}
+    def _deliver(self, message):
+        message_id, subject, body, html_content, recipients, video_ids, attempts = message
+        recipients = json.loads(recipients)
+        video_ids = json.loads(video_ids)
+        started = time.perf_counter()
+        try:
+            if self.server is None or self.sent_on_connection >= self.max_messages_per_connection:
+                self._close_connection()
+                self.server = open_smtp_connection()
+                metrics.increment('smtp_connections')
+            self.server.send_message(build_message(subject, body, html_content, recipients), to_addrs=recipients)
+            self.sent_on_connection += 1
+            self.last_sent_at = time.monotonic()
+            metrics.observe('smtp', time.perf_counter() - started)
+        except Exception as e:
+            metrics.increment('smtp_errors')
+            self._close_connection()  # 연결 문제일 수 있으므로 다음 시도는 새 연결로
+            attempts += 1
+            give_up = attempts >= OUTBOX_MAX_ATTEMPTS
+            delay = OUTBOX_RETRY_BASE_DELAY * (2 ** (attempts - 1))
+            db = get_state_db()
+            with _state_lock, db:
+                db.execute(
+                    "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    ('failed' if give_up else 'pending', attempts, time.time() + delay, str(e)[:500], message_id),
+                )
+            if give_up:
+                self.failed_count += 1
+                _update_video_status(video_ids, 'failed')
+                log.error("   ❌ 이메일 발송 포기 (%s회 실패): %.50s... (%s)", attempts, subject, e)
+            else:
+                log.warning("   ⚠ 이메일 발송 실패, %s초 후 재시도 (%s/%s): %s", delay, attempts, OUTBOX_MAX_ATTEMPTS, e)
+            return
+        
+        db = get_state_db()
+        with _state_lock, db:
+            db.execute(
+                "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ?, last_error = NULL WHERE id = ?",
+                (attempts + 1, time.time(), message_id),
+            )
+        _update_video_status(video_ids, 'sent')
+        self.sent_count += 1
+        log.info("   📧 이메일 발송: %.50s... → %d명", subject, len(recipients))
 
-위 내용을 바탕으로 전문적이고 상세한 요약을 작성해줘."""
-                        
-                        try:
-                            # 새 API 사용법 (상세 요약을 위한 설정 추가)
-                            response = client.models.generate_content(
-                                model=model_name,
-                                contents=prompt,
-                                config={
-                                    "temperature": 0.3,  # 일관성 있는 요약을 위해 낮게 설정
-                                    "top_p": 0.9,
-                                    "top_k": 40,
-                                    "max_output_tokens": 4096,  # 상세한 요약을 위해 토큰 증가
-                                }
-                            )
-                            summary = response.text
-                            print(f"   ✅ 요약 생성 완료")
-                            if DEBUG:
-                                print(f"   📝 요약 내용:\n{'-'*60}\n{summary}\n{'-'*60}")
-                            else:
-                                print(f"   📝 요약 길이: {len(summary)}자")
-                        except Exception as gemini_error:
-                            error_msg = str(gemini_error)
-                            
-                            # API 한도 초과 에러 처리
-                            if "429" in error_msg or "quota" in error_msg.lower() or "ResourceExhausted" in str(type(gemini_error)):
-                                print(f"\n{'='*60}")
-                                print(f"❌ Gemini API 무료 요금제 한도 초과")
-                                print(f"{'='*60}")
-                                print(f"📋 문제: API 요청 한도에 도달했습니다.")
-                                print(f"\n📊 무료 요금제 한도:")
-                                print(f"   • 분당 요청: {GEMINI_FREE_TIER_LIMITS['requests_per_minute']}회")
-                                print(f"   • 일일 요청: {GEMINI_FREE_TIER_LIMITS['requests_per_day']}회")
-                                print(f"   • 분당 입력 토큰: {GEMINI_FREE_TIER_LIMITS['input_tokens_per_minute']:,}개")
-                                print(f"   • 일일 입력 토큰: {GEMINI_FREE_TIER_LIMITS['input_tokens_per_day']:,}개")
-                                print(f"\n✅ 해결 방법:")
-                                print(f"   1️⃣ 내일까지 기다리기 (24시간 후 리셋)")
-                                print(f"   2️⃣ 유료 요금제 업그레이드")
-                                print(f"      🔗 https://ai.google.dev/pricing")
-                                print(f"   3️⃣ 다른 API 키 사용")
-                                print(f"\n📖 참고 자료:")
-                                print(f"   🔗 https://ai.google.dev/gemini-api/docs/rate-limits")
-                                print(f"   🔗 https://ai.dev/usage?tab=rate-limit")
-                                print(f"{'='*60}\n")
-                                
-                                # 프로그램 종료
-                                raise Exception("API 한도 초과로 프로그램 종료")
-                            else:
-                                print(f"   ❌ 요약 생성 실패: {error_msg}")
-                                
-                                if DEBUG:
-                                    print("=" * 60)
-                                    print("🛑 디버깅 모드: 에러 발생으로 중단")
-                                    print("=" * 60)
-                                    raise
-                                else:
-                                    raise
-                        
-                        # 6. 이메일 전송 여부 확인
-                        print(f"\n{'─'*60}")
-                        send_choice = input("📧 이메일을 전송하시겠습니까? (y: 전송 / n: 스킵): ").strip().lower()
-                        print(f"{'─'*60}")
-
-                        if send_choice == 'y':
-                            print(f"   ⏳ 이메일 전송 중...")
-                            email_body = f"""
-═══════════════════════════════════════════════════
-📺 YouTube 영상 요약
-═══════════════════════════════════════════════════
+    def _close_connection(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+        self.server = None
+        self.sent_on_connection = 0
 
-🎬 제목: {entry.title}
+# --- 수신자 그룹 ---
+# 그룹마다 받을 채널과 발송 방식을 정함 (recipient_groups.json, 없으면 EMAIL_RECIPIENTS 전체가 한 그룹)
+# 요약의 HTML 변환은 영상마다 한 번만 하고, 같은 그룹의 수신자들은 한 통의 이메일(숨은 참조)로 받음
+# 다이제스트 그룹의 요약은 DB에 모아 두었다가 발송 시각에 한 통으로 묶어 발송 대기열에 저장
+RECIPIENT_GROUPS_FILE = 'recipient_groups.json'
+# 그룹 설정 예:
+# [
+#   {"name": "경제", "recipients": ["a@example.com", "b@example.com"],
+#    "channels": ["UCBM86JVoHLqg9irpR2XKvGw", "소수몽키"], "schedule": "immediate"},
+#   {"name": "아침 브리핑", "recipients": ["c@example.com"], "channels": [], "schedule": "daily", "send_at": "07:00"}
+# ]
+# channels: 채널 ID 또는 채널 이름 목록 (비어 있으면 모든 채널)
+# schedule: immediate(영상마다 발송) / digest(실행마다 다이제스트) / daily(매일 send_at 이후 첫 실행에서 다이제스트)
+RECIPIENT_GROUP_SCHEDULES = ('immediate', 'digest', 'daily')
+DEFAULT_RECIPIENT_GROUP = '기본'
 
-🔗 링크: {entry.link}
+def load_recipient_groups(filepath=RECIPIENT_GROUPS_FILE):
+    """수신자 그룹 설정 불러오기 (파일이 없으면 빈 리스트, 설정이 잘못되었으면 None 반환)"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            groups = json.load(f)
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        log.error("❌ %s 읽기 실패: %s", filepath, e)
+        return None
+    
+    names = set()
+    for group in groups:
+        name = group.get('name')
+        problem = None
+        if not name or name in names:
+            problem = "name이 없거나 중복됨"
+        elif not group.get('recipients'):
+            problem = "recipients가 비어 있음"
+        elif group.setdefault('schedule', 'immediate') not in RECIPIENT_GROUP_SCHEDULES:
+            problem = f"schedule은 {', '.join(RECIPIENT_GROUP_SCHEDULES)} 중 하나여야 함"
+        elif group['schedule'] == 'daily' and not re.fullmatch(r'([01]?\d|2[0-3]):[0-5]\d', str(group.get('send_at', ''))):
+            problem = "daily 그룹에는 send_at(\"HH:MM\", 00:00~23:59)이 필요함"
+        if problem:
+            log.error("❌ %s의 수신자 그룹 설정 오류 (%s): %s", filepath, name or '이름 없음', problem)
+            return None
+        names.add(name)
+        group['channels'] = set(group.get('channels') or [])
+    log.debug("📬 수신자 그룹 %d개 로드", len(groups))
+    return groups
 
-📅 게시일: {entry.published if hasattr(entry, 'published') else 'N/A'}
+def get_recipient_groups():
+    """사용할 수신자 그룹 목록 (설정 파일이 없으면 EMAIL_RECIPIENTS 전체가 한 그룹)
 
-═══════════════════════════════════════════════════
-📝 요약 내용
-═══════════════════════════════════════════════════
+    DIGEST_MODE(--digest)에서는 immediate 그룹도 실행마다 다이제스트로 받습니다.
+    """
+    groups = RECIPIENT_GROUPS or [
+        {'name': DEFAULT_RECIPIENT_GROUP, 'recipients': RECIPIENT_LIST, 'channels': set(), 'schedule': 'immediate'}
+    ]
+    if DIGEST_MODE:
+        groups = [
+            {**group, 'schedule': 'digest'} if group['schedule'] == 'immediate' else group
+            for group in groups
+        ]
+    return groups
 
-{summary}
+def group_accepts_video(group, video):
+    """그룹이 해당 영상의 채널을 받는지 확인"""
+    channels = group['channels']
+    return not channels or video.get('channel_id') in channels or video.get('channel_name') in channels
 
-═══════════════════════════════════════════════════
-🤖 이 요약은 TubeLetter에 의해 자동 생성되었습니다.
-═══════════════════════════════════════════════════
-"""
-                            send_email(f"[요약] {entry.title}", email_body)
-                            print(f"   ✅ 이메일 전송 완료")
-                        else:
-                            print(f"   ⏭ 이메일 전송 스킵")
-                        
-                        processed_videos.add(video_id)
-                        save_processed_videos(processed_videos)  # ✅ 즉시 저장
-                        print(f"✅ 처리 완료: {entry.title[:50]}...\n")
-                        
-                        channel_processed += 1
-                        total_processed += 1
-                        
-                        # 사용자 확인 받기 (계속 진행 여부)
-                        print(f"{'─'*60}")
-                        user_input = input("⏸ 다음 영상을 처리하시겠습니까? (Enter: 계속 / q: 종료): ").strip().lower()
-                        if user_input == 'q':
-                            print(f"\n🛑 사용자 요청으로 프로그램 종료")
-                            return
-                        print(f"{'─'*60}\n")
-                        
-                except Exception as e:
-                    error_msg = str(e)
-                    
-                    # API 한도 초과 에러
-                    if "API 한도 초과" in error_msg:
-                        print(f"\n⏹ 프로그램 종료됨")
-                        raise
-                    
-                    # 다른 에러는 계속 진행
-                    print(f"⚠ 영상 처리 중 오류: {error_msg[:80]}")
+# 다이제스트 항목으로 저장할 영상 정보
+DIGEST_VIDEO_FIELDS = ('video_id', 'title', 'link', 'published', 'channel_id', 'channel_name', 'summary', 'summary_html')
+
+def _insert_digest_item(db, group, video):
+    """다이제스트 그룹에 보낼 영상 요약 저장 (HTML로 변환된 요약도 함께 저장하여 다시 변환하지 않음)"""
+    item = {key: video.get(key) for key in DIGEST_VIDEO_FIELDS}
+    db.execute(
+        "INSERT INTO digest_items (group_name, video_id, video, added_at) VALUES (?, ?, ?, ?)",
+        (group['name'], video['video_id'], json.dumps(item, ensure_ascii=False), time.time()),
+    )
+
+def _daily_send_due(group, last_sent_at, now):
+    """오늘의 send_at 시각이 지났고 그 이후 아직 보내지 않았는지 확인"""
+    hour, minute = map(int, group['send_at'].split(':'))
+    send_at = datetime.fromtimestamp(now).replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp()
+    return now >= send_at and (last_sent_at or 0) < send_at
+
+def flush_digests(groups, now=None):
+    """발송할 때가 된 다이제스트 그룹의 요약을 한 통으로 묶어 발송 대기열에 저장 (저장한 이메일 수 반환)"""
+    now = now or time.time()
+    db = get_state_db()
+    queued = 0
+    for group in groups:
+        if group['schedule'] == 'immediate':
+            continue
+        try:
+            with _state_lock:
+                row = db.execute(
+                    "SELECT last_sent_at FROM recipient_group_state WHERE group_name = ?", (group['name'],)
+                ).fetchone()
+                if group['schedule'] == 'daily' and not _daily_send_due(group, row[0] if row else None, now):
                     continue
-            
-            if DEBUG:
-                print(f"📊 채널 '{channel_name}' 처리 완료: {channel_processed}개 영상 요약")
-                
+                items = db.execute(
+                    "SELECT id, video FROM digest_items WHERE group_name = ? ORDER BY id", (group['name'],)
+                ).fetchall()
+            if not items:
+                continue
+            videos = [json.loads(video) for _, video in items]
+            subject, body, html_content = build_digest(videos, group)
+            # 항목 삭제, 이메일 저장, 발송 시각 기록을 하나의 트랜잭션으로 (중간에 실패해도 중복/누락 없음)
+            with _state_lock, db:
+                deleted = db.execute(
+                    "DELETE FROM digest_items WHERE group_name = ? AND id <= ?", (group['name'], items[-1][0])
+                ).rowcount
+                if deleted != len(items):
+                    # 다른 작업자 프로세스가 먼저 발송 대기열에 저장함
+                    db.rollback()
+                    continue
+                _insert_outbox(db, subject, body, html_content,
+                               [video['video_id'] for video in videos], group['recipients'])
+                db.execute(
+                    "INSERT INTO recipient_group_state (group_name, last_sent_at) VALUES (?, ?) "
+                    "ON CONFLICT(group_name) DO UPDATE SET last_sent_at = excluded.last_sent_at",
+                    (group['name'], now),
+                )
+            queued += 1
+            log.info("\n📮 다이제스트 발송 대기열에 저장: %s (%d개 영상, 수신자 %d명)", group['name'], len(videos), len(group['recipients']))
         except Exception as e:
-            print(f"⚠ 피드 처리 중 오류: {e}")
+            # 저장된 항목은 남아 있으므로 다음 실행에서 다시 시도
+            log.warning("⚠ 다이제스트 저장 실패 (%s): %s", group['name'], e)
+    return queued
+
+# 수신자 그룹 설정 (main()에서 load_recipient_groups()로 채움, 비어 있으면 EMAIL_RECIPIENTS 전체가 한 그룹)
+RECIPIENT_GROUPS = []
+
+# --- RSS 피드 캐시 (조건부 GET) ---
+# 변경되지 않은 피드는 304 응답 또는 동일한 본문 해시로 감지하여 파싱을 건너뜀
+FEED_NOT_MODIFIED = object()  # 피드가 지난 실행 이후 변경되지 않았음을 나타내는 값
+
+def load_feed_cache():
+    """파일에서 피드 캐시 불러오기 ({feed_url: {etag, modified, content_hash, channel_name, entries}})"""
+    try:
+        with open(FEED_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        log.warning("⚠ 피드 캐시 로드 실패: %s", e)
+        return {}
+
+def save_feed_cache(feed_cache):
+    """피드 캐시를 파일에 저장 (임시 파일에 쓴 뒤 교체하여 중간에 깨지지 않도록 함)"""
+    try:
+        _write_json_atomic(FEED_CACHE_FILE, feed_cache)
+    except Exception as e:
+        log.warning("⚠ 피드 캐시 저장 실패: %s", e)
+
+def feed_has_pending_entries(cache_entry, processed_videos, time_threshold):
+    """캐시된 영상 중 아직 처리되지 않은 최근 영상이 있는지 확인
+
+    이런 피드는 304를 받으면 영상 목록을 다시 볼 수 없으므로 조건 없이 다시 받아야 합니다.
+    """
+    threshold_timestamp = time_threshold.timestamp()
+    for video_id, published_timestamp in cache_entry.get('entries', []):
+        if video_id in processed_videos:
             continue
-    
-    # 최종 통계
-    print(f"\n{'='*60}")
-    print(f"📊 처리 완료 통계")
-    print(f"{'='*60}")
-    print(f"✅ 요약 생성: {total_processed}개")
-    print(f"⏭ 캐시 스킵: {total_skipped_cached}개")
-    print(f"⏭ 오래된 영상 스킵: {total_skipped_old}개")
-    print(f"{'='*60}")
+        if published_timestamp is None or published_timestamp >= threshold_timestamp:
+            return True
+    return False
 
-# 프로그램 실행
-if __name__ == "__main__":
-    if DEBUG:
-        print("=" * 60)
-        print("🚀 TubeLetter 프로그램 시작")
-        print("=" * 60)
-    
+def update_high_water_marks(feed_cache, processed_videos, time_threshold):
+    """피드별 탐색 기준점(high_water) 갱신
+
+    기준점은 '이 영상과 그보다 오래된 영상은 모두 처리되었거나 기간 밖'인 가장 최신 영상입니다.
+    연기된 영상(한도/자막 오류)이 있으면 기준점은 그보다 오래된 영상에 머물러 다음 실행에서 다시 확인됩니다.
+    """
+    threshold_timestamp = time_threshold.timestamp()
+    for cache_entry in feed_cache.values():
+        high_water = None
+        for video_id, published_timestamp in cache_entry.get('entries', []):  # 최신순
+            done = video_id in processed_videos or (
+                published_timestamp is not None and published_timestamp < threshold_timestamp
+            )
+            if not done:
+                high_water = None
+            elif high_water is None:
+                high_water = {'video_id': video_id, 'published': published_timestamp}
+        if high_water:
+            cache_entry['high_water'] = high_water
+        else:
+            cache_entry.pop('high_water', None)
+
+def _reached_high_water(high_water, video_id, published_timestamp):
+    """이전 실행에서 확인을 마친 영상(또는 그보다 오래된 영상)인지 확인"""
+    if not high_water:
+        return False
+    if video_id == high_water['video_id']:
+        return True
+    return (published_timestamp is not None and high_water['published'] is not None
+            and published_timestamp < high_water['published'])
+
+def _entry_timestamp(entry):
+    """피드 항목의 게시 시각을 UTC 타임스탬프로 변환 (정보가 없으면 None)"""
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    return calendar.timegm(parsed) if parsed else None
+
+def _download_feed(feed_url, timeout, etag=None, modified=None):
+    """RSS 피드 원본(XML)을 다운로드 (상태 코드, 응답 본문, 응답 헤더 반환)"""
+    headers = {'User-Agent': 'TubeLetter/1.0'}
+    if etag:
+        headers['If-None-Match'] = etag
+    if modified:
+        headers['If-Modified-Since'] = modified
+    request = urllib.request.Request(feed_url, headers=headers)
     try:
-        if RSS_FEEDS:
-            print("🔄 자동화 작업 실행 중...")
-            process_youtube_automation()
-            print("✅ 작업 완료\n")
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read(), dict(response.headers)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, None, dict(e.headers)
+        raise
+
+def fetch_feed(feed_url, timeout=FEED_FETCH_TIMEOUT, cache_entry=None):
+    """단일 RSS 피드를 다운로드하여 파싱 (timeout 초 안에 응답이 없으면 예외 발생)
+
+    cache_entry가 주어지면 조건부 요청을 보내고, 변경이 없으면 FEED_NOT_MODIFIED를 반환합니다.
+    반환값: (feed 또는 FEED_NOT_MODIFIED, 새 캐시 항목)
+    """
+    cache_entry = cache_entry or {}
+    status, content, headers = _download_feed(
+        feed_url, timeout, cache_entry.get('etag'), cache_entry.get('modified')
+    )
+    if status == 304:
+        return FEED_NOT_MODIFIED, cache_entry
+
+    content_hash = hashlib.sha256(content).hexdigest()
+    new_cache_entry = {
+        'etag': headers.get('ETag') or headers.get('Etag'),
+        'modified': headers.get('Last-Modified'),
+        'content_hash': content_hash,
+    }
+    # 서버가 검증 헤더를 주지 않아도 본문이 같으면 파싱 생략
+    if cache_entry.get('content_hash') == content_hash:
+        return FEED_NOT_MODIFIED, {**cache_entry, **new_cache_entry}
+
+    import feedparser  # 변경된 피드가 있을 때만 불러옴
+    feed = feedparser.parse(content, response_headers=headers)
+    new_cache_entry['channel_name'] = feed.feed.get('title', 'Unknown')
+    new_cache_entry['entries'] = [
+        [entry.get('yt_videoid'), _entry_timestamp(entry)] for entry in feed.entries
+    ]
+    return feed, new_cache_entry
+
+def _timed_fetch_feed(feed_url, timeout, cache_entry):
+    """fetch_feed를 실행하고 채널별 다운로드 시간을 metrics에 기록"""
+    started = time.perf_counter()
+    channel_name = (cache_entry or {}).get('channel_name')
+    try:
+        feed, new_cache_entry = fetch_feed(feed_url, timeout, cache_entry)
+    except Exception:
+        metrics.record_feed(feed_url, channel_name, time.perf_counter() - started, 'error')
+        raise
+    status = 'not_modified' if feed is FEED_NOT_MODIFIED else 'ok'
+    metrics.record_feed(feed_url, new_cache_entry.get('channel_name', channel_name),
+                        time.perf_counter() - started, status)
+    return feed, new_cache_entry
+
+def fetch_all_feeds(feed_urls, feed_cache=None, conditional_urls=None,
+                    max_workers=FEED_FETCH_WORKERS, timeout=FEED_FETCH_TIMEOUT):
+    """모든 RSS 피드를 동시에 가져오기
+
+    결과는 입력 순서와 같은 (feed_url, feed, error) 튜플 리스트로 반환합니다.
+    느리거나 응답 없는 피드는 timeout 후 error로 기록되고 다른 피드를 막지 않습니다.
+    feed_cache가 주어지면 conditional_urls에 속한 피드는 조건부 요청으로 가져오고,
+    받은 검증 헤더로 feed_cache를 갱신합니다. 변경 없는 피드의 feed는 FEED_NOT_MODIFIED입니다.
+    """
+    results = [None] * len(feed_urls)
+    if not feed_urls:
+        return results
+    if feed_cache is None:
+        feed_cache = {}
+    if conditional_urls is None:
+        conditional_urls = set(feed_cache)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(feed_urls)))) as executor:
+        future_to_index = {
+            executor.submit(
+                _timed_fetch_feed, feed_url, timeout,
+                feed_cache.get(feed_url) if feed_url in conditional_urls else None
+            ): index
+            for index, feed_url in enumerate(feed_urls)
+        }
+        for future in as_completed(future_to_index):
+            index = future_to_index[future]
+            feed_url = feed_urls[index]
+            try:
+                feed, cache_entry = future.result()
+                # 새로 받은 피드에도 이전 실행의 탐색 기준점(high_water)은 유지
+                previous_entry = feed_cache.get(feed_url) or {}
+                if 'high_water' in previous_entry:
+                    cache_entry.setdefault('high_water', previous_entry['high_water'])
+                feed_cache[feed_url] = cache_entry
+                results[index] = (feed_url, feed, None)
+            except Exception as e:
+                results[index] = (feed_url, None, e)
+
+    if log.isEnabledFor(logging.DEBUG):
+        failed = sum(1 for _, _, error in results if error is not None)
+        unchanged = sum(1 for _, feed, _ in results if feed is FEED_NOT_MODIFIED)
+        log.debug("📥 피드 다운로드 완료: %d개 (%d개 변경 없음, %d개 실패, %.1f초)",
+                  len(feed_urls), unchanged, failed, time.time() - started)
+    return results
+
+# --- 채널 확인 일정 (적응형 폴링) ---
+# 피드 기록에서 채널별 업로드 간격을 추정하여 자주 올리는 채널은 자주, 뜸한 채널은 드물게 확인
+# 전체 피드 요청 수는 시간당 예산(토큰 버킷)으로 제한하고, 확인할 때가 된 채널은 우선순위 큐에서 꺼냄
+POLL_SCHEDULE_FILE = 'poll_schedule.json'  # 채널별 다음 확인 시각과 남은 예산 (실행 간 유지)
+ADAPTIVE_POLLING = True  # False: 채널마다 설정된 확인 간격(poll_interval)을 그대로 사용
+POLL_BUDGET_PER_HOUR = 3600  # 시간당 최대 피드 요청 수 (모든 채널 합계)
+POLL_MIN_INTERVAL = 10 * 60  # 가장 자주 확인하는 간격 (초, 피드 요청 실패 시 재시도 간격)
+POLL_MAX_INTERVAL = HOURS_TO_CHECK * 3600 // 2  # 가장 드물게 확인하는 간격 (HOURS_TO_CHECK 안에 두 번은 확인해야 영상을 놓치지 않음)
+POLLS_PER_UPLOAD = 4  # 평균 업로드 간격 동안 확인할 횟수
+POLL_DUE_TOLERANCE = 120  # 확인 시각까지 이만큼 남은 채널도 이번 실행에서 확인 (초, 실행 시각 오차 보정)
+DAEMON_MIN_SLEEP = 60  # 데몬 모드에서 실행 사이 최소 대기 시간 (초)
+
+def estimate_upload_interval(entries, now):
+    """피드 항목([영상 ID, 게시 시각])으로 평균 업로드 간격(초) 추정 (게시 시각이 2개 미만이면 None)"""
+    timestamps = sorted((published for _, published in entries if published is not None), reverse=True)
+    if len(timestamps) < 2:
+        return None
+    average = (timestamps[0] - timestamps[-1]) / (len(timestamps) - 1)
+    # 마지막 업로드 이후 오래 조용했다면 평균보다 뜸해진 것으로 봄
+    return max(average, (now - timestamps[0]) / 2)
+
+class PollScheduler:
+    """채널별 다음 확인 시각과 전체 피드 요청 예산을 관리"""
+
+    def __init__(self, state_file=POLL_SCHEDULE_FILE, budget_per_hour=POLL_BUDGET_PER_HOUR):
+        self.state_file = state_file
+        self.budget_per_hour = budget_per_hour
+        state = self._load()
+        self.schedule = state.get('channels', {})  # feed_url -> {'next_poll_at', 'interval'}
+        # 예산 버킷 (처음에는 가득 찬 상태, 초당 예산/3600 만큼 채워짐)
+        self.tokens = float(state.get('tokens', budget_per_hour))
+        self.last_refill = float(state.get('updated_at', time.time()))
+
+    def _load(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            log.warning("⚠ 채널 확인 일정 로드 실패: %s", e)
+            return {}
+
+    def save(self, channels=None):
+        """일정 저장 (channels가 주어지면 목록에 없는 채널의 일정은 삭제)"""
+        if channels is not None:
+            feed_urls = {channel['feed_url'] for channel in channels}
+            self.schedule = {url: entry for url, entry in self.schedule.items() if url in feed_urls}
+        try:
+            _write_json_atomic(self.state_file, {
+                'tokens': self.tokens,
+                'updated_at': self.last_refill,
+                'channels': self.schedule,
+            })
+        except Exception as e:
+            log.warning("⚠ 채널 확인 일정 저장 실패: %s", e)
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self.last_refill)
+        self.tokens = min(float(self.budget_per_hour), self.tokens + elapsed * self.budget_per_hour / 3600)
+        self.last_refill = now
+
+    def due_feeds(self, channels, always_due=(), now=None):
+        """이번 실행에서 확인할 피드 URL 목록 (우선순위 높은 순 → 오래 기다린 순, 예산 안에서)
+
+        always_due에 속한 피드(연기된 영상이 남아 있는 채널)는 일정과 관계없이 확인 대상입니다.
+        예산이 모자라 남은 채널은 확인 시각이 그대로이므로 다음 실행에서 먼저 확인됩니다.
+        """
+        now = now or time.time()
+        self._refill(now)
+        due_heap = []
+        for channel in channels:
+            feed_url = channel['feed_url']
+            next_poll_at = self.schedule.get(feed_url, {}).get('next_poll_at', 0)
+            if feed_url in always_due or next_poll_at <= now + POLL_DUE_TOLERANCE:
+                due_heap.append((-channel['priority'], next_poll_at, feed_url))
+        heapq.heapify(due_heap)
+        due = []
+        while due_heap and self.tokens >= 1:
+            _, _, feed_url = heapq.heappop(due_heap)
+            due.append(feed_url)
+            self.tokens -= 1
+        metrics.increment('feeds_due', len(due) + len(due_heap))
+        if due_heap:
+            metrics.increment('feeds_over_budget', len(due_heap))
+            log.info("⏳ 피드 요청 예산 부족: %d개 채널은 다음 실행에서 확인", len(due_heap))
+        return due
+
+    def record_poll(self, channel, cache_entry, succeeded, now=None):
+        """피드를 확인한 뒤 다음 확인 시각 계산"""
+        now = now or time.time()
+        if not succeeded:
+            interval = POLL_MIN_INTERVAL
+        elif ADAPTIVE_POLLING:
+            upload_interval = estimate_upload_interval((cache_entry or {}).get('entries', []), now)
+            if upload_interval is None:
+                interval = channel['poll_interval']
+            else:
+                interval = min(max(upload_interval / POLLS_PER_UPLOAD, POLL_MIN_INTERVAL), POLL_MAX_INTERVAL)
         else:
-            print("❌ RSS 피드가 없어 프로그램을 종료합니다.")
-    except Exception as e:
-        error_msg = str(e)
-        
-        # API 한도 초과 에러
-        if "API 한도 초과" in error_msg:
+            interval = channel['poll_interval']
+        self.schedule[channel['feed_url']] = {'next_poll_at': now + interval, 'interval': round(interval)}
+
+    def next_due_at(self, channels):
+        """가장 먼저 확인할 때가 되는 채널의 확인 시각 (예산이 바닥났으면 다시 채워지는 시각, 채널이 없으면 None)"""
+        next_due_at = min(
+            (self.schedule.get(channel['feed_url'], {}).get('next_poll_at', 0) for channel in channels),
+            default=None,
+        )
+        if next_due_at is not None and self.tokens < 1:
+            next_due_at = max(next_due_at, self.last_refill + (1 - self.tokens) * 3600 / self.budget_per_hour)
+        return next_due_at
+
+poll_scheduler = None  # main()에서 생성 (None이면 실행마다 모든 채널 확인)
+
+# --- Gemini 요청 속도 제한 ---
+# GEMINI_FREE_TIER_LIMITS를 기준으로 요청 전에 한도를 확인하여 429 오류를 미리 피함
+GEMINI_USAGE_FILE = 'gemini_usage.json'  # API 키/모델별 일일 사용량 기록 (실행 간 유지)
+GEMINI_MAX_RETRIES = 3  # 429 응답 시 재시도 횟수
+GEMINI_RETRY_BASE_DELAY = 10  # 429 재시도 기본 대기 시간 (초, 시도마다 2배)
+
+class GeminiQuotaExhausted(Exception):
+    """일일 한도를 모두 사용하여 더 이상 요청할 수 없을 때 발생 (남은 영상은 다음 실행으로 연기)"""
+
+class GeminiRequestDeferred(Exception):
+    """Gemini 오류가 재시도 후에도 계속되어 이번 요청만 다음 실행으로 미룰 때 발생 (휴식은 슬롯별로 처리)"""
+
+def _write_json_atomic(filepath, data):
+    """임시 파일에 쓴 뒤 교체하여 저장 도중 파일이 깨지지 않도록 함"""
+    temp_file = f"{filepath}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_file, filepath)
+
+def estimate_tokens(text):
+    """프롬프트의 입력 토큰 수 추정 (ASCII는 약 4자당 1토큰, 한글 등은 1자당 1토큰으로 보수적으로 계산)"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+def _quota_day():
+    """일일 한도 기준 날짜 (Gemini 일일 한도는 태평양 시간 자정에 초기화됨)"""
+    try:
+        from zoneinfo import ZoneInfo
+        return datetime.now(ZoneInfo("America/Los_Angeles")).strftime('%Y-%m-%d')
+    except Exception:
+        return datetime.now().strftime('%Y-%m-%d')
+
+_usage_file_lock = threading.Lock()  # 여러 제한기가 같은 사용량 파일을 고쳐 쓸 때 사용
+
+class GeminiRateLimiter:
+    """분당 요청/토큰은 토큰 버킷으로, 일일 요청/토큰은 파일에 저장된 카운터로 제한
+
+    name을 주면 사용량 파일 안의 해당 항목만 읽고 씁니다 (API 키/모델 조합별 한도).
+    """
+
+    def __init__(self, limits, usage_file=GEMINI_USAGE_FILE, name=None):
+        self.limits = limits
+        self.usage_file = usage_file
+        self.name = name
+        self.lock = threading.Lock()
+        self.exhausted = False  # 서버가 일일 한도 초과(429)를 알려 와 한도 날짜가 바뀔 때까지 요청을 멈췄는지 여부
+        # 분당 한도 버킷 (가득 찬 상태로 시작, 초당 한도/60 만큼 채워짐)
+        self.request_tokens = float(limits['requests_per_minute'])
+        self.input_tokens = float(limits['input_tokens_per_minute'])
+        self.last_refill = time.monotonic()
+        self.usage = self._load_usage()
+
+    def _load_usage(self):
+        """파일에서 오늘 사용량 불러오기 (날짜가 바뀌었으면 0부터 시작)"""
+        try:
+            with open(self.usage_file, 'r', encoding='utf-8') as f:
+                usage = json.load(f)
+            if self.name is not None:
+                usage = usage.get(self.name) or {}
+            if usage.get('date') == _quota_day():
+                return usage
+        except FileNotFoundError:
             pass
-        else:
-            print(f"❌ 오류 발생: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception as e:
+            log.warning("⚠ Gemini 사용량 로드 실패: %s", e)
+        return {'date': _quota_day(), 'requests': 0, 'input_tokens': 0}
+
+    def _save_usage(self):
+        try:
+            if self.name is None:
+                _write_json_atomic(self.usage_file, self.usage)
+                return
+            with _usage_file_lock:
+                try:
+                    with open(self.usage_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    data = {}
+                if 'date' in data:  # 이전 버전의 단일 키 형식
+                    data = {}
+                data[self.name] = self.usage
+                _write_json_atomic(self.usage_file, data)
+        except Exception as e:
+            log.warning("⚠ Gemini 사용량 저장 실패: %s", e)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.request_tokens = min(
+            float(self.limits['requests_per_minute']),
+            self.request_tokens + elapsed * self.limits['requests_per_minute'] / 60,
+        )
+        self.input_tokens = min(
+            float(self.limits['input_tokens_per_minute']),
+            self.input_tokens + elapsed * self.limits['input_tokens_per_minute'] / 60,
+        )
+        if self.usage['date'] != _quota_day():
+            self.usage = {'date': _quota_day(), 'requests': 0, 'input_tokens': 0}
+            self.exhausted = False
+
+    def daily_exhausted(self, estimated_tokens=0):
+        """오늘 남은 한도로 요청 하나(estimated_tokens 토큰)를 더 보낼 수 없는지 확인"""
+        with self.lock:
+            self._refill()
+            return self._daily_exhausted(estimated_tokens)
+
+    def _daily_exhausted(self, estimated_tokens):
+        return (
+            self.exhausted
+            or self.usage['requests'] + 1 > self.limits['requests_per_day']
+            or self.usage['input_tokens'] + estimated_tokens > self.limits['input_tokens_per_day']
+        )
+
+    def _wait_seconds(self, needed_tokens):
+        """분당 버킷이 요청 하나(needed_tokens 토큰)만큼 채워질 때까지 남은 시간 (초)"""
+        return max(
+            0.0,
+            (1 - self.request_tokens) * 60 / self.limits['requests_per_minute'],
+            (needed_tokens - self.input_tokens) * 60 / self.limits['input_tokens_per_minute'],
+        )
+
+    def wait_time(self, estimated_tokens):
+        """지금 요청하면 분당 한도 때문에 기다려야 하는 시간 (초, 사용량은 차감하지 않음)"""
+        with self.lock:
+            self._refill()
+            return self._wait_seconds(min(estimated_tokens, self.limits['input_tokens_per_minute']))
+
+    def try_acquire(self, estimated_tokens):
+        """분당 한도가 남아 있으면 사용량을 차감하고 0을, 부족하면 기다려야 할 시간(초)을 반환
+
+        일일 한도가 부족하면 GeminiQuotaExhausted를 발생시킵니다.
+        """
+        # 분당 버킷보다 큰 프롬프트는 가득 찬 버킷 하나로 처리 (무한 대기 방지)
+        needed_tokens = min(estimated_tokens, self.limits['input_tokens_per_minute'])
+        with self.lock:
+            self._refill()
+            if self._daily_exhausted(estimated_tokens):
+                raise GeminiQuotaExhausted(
+                    f"일일 한도 도달 (요청 {self.usage['requests']}/{self.limits['requests_per_day']}, "
+                    f"입력 토큰 {self.usage['input_tokens']:,}/{self.limits['input_tokens_per_day']:,})"
+                )
+            if self.request_tokens >= 1 and self.input_tokens >= needed_tokens:
+                self.request_tokens -= 1
+                self.input_tokens -= needed_tokens
+                self.usage['requests'] += 1
+                self.usage['input_tokens'] += estimated_tokens
+                self._save_usage()
+                return 0.0
+            return max(self._wait_seconds(needed_tokens), 0.01)
+
+    def record_actual(self, estimated_tokens, actual_tokens):
+        """응답에 포함된 실제 입력 토큰 수로 추정치 보정"""
+        if actual_tokens is None:
+            return
+        with self.lock:
+            difference = actual_tokens - estimated_tokens
+            self.usage['input_tokens'] = max(0, self.usage['input_tokens'] + difference)
+            self.input_tokens -= difference
+            self._save_usage()
+
+    def mark_exhausted(self):
+        """서버 기준으로 오늘 한도를 다 썼음을 기록 (태평양 시간 날짜가 바뀌면 해제)"""
+        with self.lock:
+            self.exhausted = True
+
+# --- Gemini 클라이언트 풀 (여러 API 키/모델) ---
+# API 키와 모델 조합(슬롯)마다 한도를 따로 관리하고, 요청을 한도가 남은 슬롯에 나눠 보냄
+# 429/403/5xx를 받은 슬롯은 잠시 쉬게 하고(서킷 브레이커), 앞 모델의 한도가 부족하면 다음(저렴한) 모델 사용
+GEMINI_FALLBACK_MAX_WAIT = 20  # 앞 모델의 분당 한도를 이보다 오래 기다려야 하면 다음 모델 사용 (초)
+GEMINI_MAX_COOLDOWN = 600  # 429를 연속으로 받은 슬롯의 최대 휴식 시간 (초, 매번 2배로 늘어남)
+GEMINI_KEY_COOLDOWN = 3600  # 403(권한 거부, 유출 신고된 키 등)을 받은 키를 모든 모델에서 쉬게 하는 시간 (초)
+GEMINI_MODEL_COOLDOWN = 3600  # 404(없는 모델)를 받은 키/모델 조합을 쉬게 하는 시간 (초)
+GEMINI_TRANSIENT_COOLDOWN = 5  # 5xx/시간 초과/연결 오류를 받은 슬롯의 휴식 시간 (초, 연속 실패마다 2배로 늘어남)
+GEMINI_TRANSIENT_STATUS = re.compile(r'\b(500|502|503|504)\b|INTERNAL|UNAVAILABLE|DEADLINE_EXCEEDED|overloaded', re.IGNORECASE)
+
+def create_gemini_client(api_key):
+    """API 키 하나의 Gemini 클라이언트 생성 (처음 필요할 때 google.genai를 불러옴)"""
+    from google import genai  # 변경: google.generativeai → google.genai
+    return genai.Client(api_key=api_key)
+
+def _gemini_error_kind(error):
+    """Gemini 오류 분류: 'daily_quota'(일일 한도 429), 'quota'(429), 'forbidden'(403, 잘못된 키), 'not_found'(404),
+    'transient'(5xx, 시간 초과, 연결 오류), 그 외 None"""
+    if _is_quota_error(error):
+        # 일일 한도 초과 응답은 quotaId에 "PerDay"가 들어 있음 (예: GenerateRequestsPerDayPerProjectPerModel-FreeTier)
+        return 'daily_quota' if "PerDay" in str(error) else 'quota'
+    error_msg = str(error)
+    if "403" in error_msg or "PERMISSION_DENIED" in error_msg or "API_KEY_INVALID" in error_msg:
+        return 'forbidden'
+    if "404" in error_msg or "NOT_FOUND" in error_msg:
+        return 'not_found'
+    # httpx 등의 네트워크 오류는 모듈을 불러오지 않고 클래스 이름으로 확인
+    error_type = type(error).__name__
+    if (isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in error_type or "Connect" in error_type
+            or error_type in ('RemoteProtocolError', 'ReadError', 'WriteError') or GEMINI_TRANSIENT_STATUS.search(error_msg)):
+        return 'transient'
+    return None
+
+class GeminiClientPool:
+    """여러 API 키와 모델(우선순위 순)의 조합을 슬롯으로 관리
+
+    acquire()는 쉬고 있지 않고 일일 한도가 남은 슬롯 중 앞 모델에서 가장 빨리 보낼 수 있는
+    슬롯을 고르고, 그 모델이 GEMINI_FALLBACK_MAX_WAIT보다 오래 기다려야 하면 다음 모델로 넘어갑니다.
+    쓸 수 있는 슬롯이 하나도 없으면 GeminiQuotaExhausted를 발생시킵니다.
+    """
+
+    def __init__(self, api_keys, models, limits, usage_file=GEMINI_USAGE_FILE, client_factory=None):
+        self.models = list(models)
+        self.client_factory = client_factory or create_gemini_client
+        self.lock = threading.Lock()
+        self.clients = {}  # 키 ID -> 클라이언트
+        self.api_keys = {}  # 키 ID -> API 키
+        self.key_cooldowns = {}  # 키 ID -> 다시 쓸 수 있는 시각 (403)
+        self.slots = []
+        for api_key in api_keys:
+            # 파일과 로그에는 키 대신 해시 앞부분만 남김
+            key_id = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:8]
+            self.api_keys[key_id] = api_key
+            for model in self.models:
+                name = f"{key_id}/{model}"
+                self.slots.append({
+                    'name': name,
+                    'key_id': key_id,
+                    'model': model,
+                    'limiter': GeminiRateLimiter(limits, usage_file, name=name),
+                    'cooldown_until': 0.0,  # 429 휴식이 끝나는 시각
+                    'blocked_until': 0.0,  # 404 휴식이 끝나는 시각
+                    'failures': 0,  # 연속 429 횟수
+                })
+
+    def client(self, slot):
+        return self.client_for_key(slot['key_id'])
+
+    def client_for_key(self, key_id):
+        with self.lock:
+            if key_id not in self.clients:
+                self.clients[key_id] = self.client_factory(self.api_keys[key_id])
+            return self.clients[key_id]
+
+    def available_slot(self):
+        """403/404로 제외되지 않은 첫 번째 모델의 슬롯 (배치 작업 제출용, 없으면 GeminiQuotaExhausted)"""
+        now = time.monotonic()
+        with self.lock:
+            for slot in sorted(self.slots, key=lambda slot: self.models.index(slot['model'])):
+                if self._blocked_until(slot) <= now:
+                    return slot
+        raise GeminiQuotaExhausted("사용할 수 있는 API 키/모델 없음")
+
+    def _blocked_until(self, slot):
+        return max(slot['blocked_until'], self.key_cooldowns.get(slot['key_id'], 0.0))
+
+    def _resting_until(self, slot):
+        return max(slot['cooldown_until'], self._blocked_until(slot))
+
+    def _choose(self, estimated_tokens):
+        """(보낼 슬롯, 기다릴 시간) 또는 모든 슬롯이 쉬는 중이면 (None, 가장 빨리 끝나는 휴식까지 남은 시간)"""
+        now = time.monotonic()
+        best_by_model = []
+        resting = []
+        for model in self.models:
+            best = None
+            for slot in self.slots:
+                if slot['model'] != model or slot['limiter'].daily_exhausted(estimated_tokens):
+                    continue
+                if self._blocked_until(slot) > now:
+                    continue  # 403/404: 이번 실행에서는 기다리지 않음
+                if slot['cooldown_until'] > now:
+                    resting.append(slot['cooldown_until'] - now)
+                    continue
+                wait = slot['limiter'].wait_time(estimated_tokens)
+                if best is None or wait < best[1]:
+                    best = (slot, wait)
+            if best is not None:
+                if best[1] <= GEMINI_FALLBACK_MAX_WAIT:
+                    return best
+                best_by_model.append(best)
+        if best_by_model:
+            return min(best_by_model, key=lambda candidate: candidate[1])
+        if resting:
+            return None, min(resting)
+        raise GeminiQuotaExhausted("모든 API 키/모델이 일일 한도에 도달했거나 사용할 수 없음")
+
+    def acquire(self, estimated_tokens):
+        """요청을 보낼 슬롯을 골라 한도를 차감한 뒤 반환 (필요하면 대기)"""
+        while True:
+            with self.lock:
+                slot, wait_seconds = self._choose(estimated_tokens)
+            if slot is not None:
+                try:
+                    wait_seconds = slot['limiter'].try_acquire(estimated_tokens)
+                except GeminiQuotaExhausted:
+                    continue  # 다른 작업자가 먼저 한도를 써 버림, 다른 슬롯 선택
+                if not wait_seconds:
+                    return slot
+            log.debug("   ⏳ Gemini 한도 대기: %.1f초", wait_seconds)
+            time.sleep(wait_seconds)
+
+    def report_success(self, slot):
+        with self.lock:
+            slot['failures'] = 0
+
+    def report_failure(self, slot, error):
+        """오류 종류에 따라 슬롯(또는 키 전체)을 쉬게 함 (풀에서 처리할 수 없는 오류면 None 반환)"""
+        kind = _gemini_error_kind(error)
+        now = time.monotonic()
+        with self.lock:
+            if kind == 'daily_quota':
+                slot['limiter'].mark_exhausted()
+                log.warning("   ⚠ Gemini 일일 한도 초과 응답(429): %s 오늘은 사용 중지", slot['name'])
+            elif kind in ('quota', 'transient'):
+                base_delay = GEMINI_RETRY_BASE_DELAY if kind == 'quota' else GEMINI_TRANSIENT_COOLDOWN
+                cooldown = min(base_delay * (2 ** slot['failures']), GEMINI_MAX_COOLDOWN)
+                slot['failures'] += 1
+                slot['cooldown_until'] = now + cooldown
+                if kind == 'quota':
+                    log.warning("   ⚠ Gemini 한도 초과 응답(429): %s %s초 휴식", slot['name'], cooldown)
+                else:
+                    log.warning("   ⚠ Gemini 일시적 오류: %s %s초 휴식 (%.80s)", slot['name'], cooldown, error)
+            elif kind == 'forbidden':
+                self.key_cooldowns[slot['key_id']] = now + GEMINI_KEY_COOLDOWN
+                log.error("   ❌ Gemini API 키 %s 거부됨(403), %s초 동안 제외: %.120s", slot['key_id'], GEMINI_KEY_COOLDOWN, error)
+            elif kind == 'not_found':
+                slot['blocked_until'] = now + GEMINI_MODEL_COOLDOWN
+                log.error("   ❌ Gemini 모델 사용 불가(404): %s, %s초 동안 제외", slot['name'], GEMINI_MODEL_COOLDOWN)
+        return kind
+
+    def daily_exhausted(self, estimated_tokens=0):
+        """모든 슬롯이 일일 한도에 도달했거나 키/모델 오류로 이번 실행에서 쓸 수 없는지 확인"""
+        now = time.monotonic()
+        with self.lock:
+            for slot in self.slots:
+                # 429 휴식은 곧 끝나므로 사용 가능으로 봄
+                if not slot['limiter'].daily_exhausted(estimated_tokens) and self._blocked_until(slot) <= now:
+                    return False
+            return True
+
+    def usage(self):
+        """오늘 사용량 합계 ({'requests', 'input_tokens', 'requests_per_day', 'input_tokens_per_day'})"""
+        total = {'requests': 0, 'input_tokens': 0, 'requests_per_day': 0, 'input_tokens_per_day': 0}
+        for slot in self.slots:
+            limiter = slot['limiter']
+            total['requests'] += limiter.usage['requests']
+            total['input_tokens'] += limiter.usage['input_tokens']
+            total['requests_per_day'] += limiter.limits['requests_per_day']
+            total['input_tokens_per_day'] += limiter.limits['input_tokens_per_day']
+        return total
+
+    def usage_by_slot(self):
+        """실행 보고서용 슬롯별 오늘 사용량 (키는 해시 앞부분으로 표시)"""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                slot['name']: {
+                    'requests': slot['limiter'].usage['requests'],
+                    'input_tokens': slot['limiter'].usage['input_tokens'],
+                    'resting_seconds': round(max(0.0, self._resting_until(slot) - now), 1),
+                }
+                for slot in self.slots
+            }
+
+# Gemini 클라이언트 풀 (요청 전에 키/모델별 무료 요금제 한도 확인, main()에서 생성)
+gemini_pool = None
+
+# --- Gemini 요약 캐시 ---
+# (모델, 프롬프트 템플릿, 분석할 내용, 생성 설정)이 같으면 저장된 응답을 재사용하여 한도를 아낌
+SUMMARY_CACHE_DIR = 'summary_cache'  # 요약 캐시 폴더 (키 해시별 JSON 파일)
+SUMMARY_CACHE_MAX_AGE_DAYS = 30  # 이 기간이 지난 요약은 삭제
+SUMMARY_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 캐시 폴더 최대 크기 (초과 시 오래 사용하지 않은 것부터 삭제)
+
+class SummaryCache:
+    """요청 내용의 해시를 키로 Gemini 응답을 디스크에 저장하는 캐시"""
+
+    def __init__(self, cache_dir=SUMMARY_CACHE_DIR, max_age_days=SUMMARY_CACHE_MAX_AGE_DAYS,
+                 max_bytes=SUMMARY_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(model, prompt_template, content, config):
+        """요청을 구성하는 값 전체의 SHA-256 해시"""
+        payload = json.dumps(
+            {'model': model, 'prompt_template': prompt_template, 'content': content, 'config': config},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """저장된 응답 반환 (없거나 만료되었으면 None)"""
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_days * 86400:
+                raise FileNotFoundError(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                summary = json.load(f)['summary']
+            os.utime(path)  # 최근 사용 시각 갱신 (크기 초과 시 삭제 순서 기준)
+        except FileNotFoundError:
+            summary = None
+        except Exception as e:
+            log.warning("⚠ 요약 캐시 읽기 실패: %s", e)
+            summary = None
+        # 적중률은 실행마다 새로 세도록 실행 지표에 기록
+        metrics.increment('summary_cache_misses' if summary is None else 'summary_cache_hits')
+        return summary
+
+    def put(self, key, model, summary):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _write_json_atomic(self._path(key), {
+                'model': model,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'summary': summary,
+            })
+        except Exception as e:
+            log.warning("⚠ 요약 캐시 저장 실패: %s", e)
+
+    def prune(self):
+        """만료된 항목을 지우고, 최대 크기를 넘으면 오래 사용하지 않은 항목부터 삭제"""
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return 0
+        now = time.time()
+        entries = []
+        removed = 0
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if now - stat.st_mtime > self.max_age_days * 86400:
+                    os.remove(path)
+                    removed += 1
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+                removed += 1
+            except OSError:
+                continue
+        if removed:
+            log.debug("🧹 요약 캐시 정리: %d개 삭제", removed)
+        return removed
+
+summary_cache = SummaryCache()
+
+# --- 자막 캐시 ---
+# 가져온 자막을 영상 ID/언어별 gzip 파일로 저장하여 재시도/재요약 시 다시 요청하지 않음
+# 자막이 없는 영상도 일정 시간 기록하여 반복 조회를 막음 (일시적인 네트워크 오류는 기록하지 않음)
+TRANSCRIPT_CACHE_DIR = 'transcript_cache'  # 자막 캐시 폴더 ({영상 ID}.{언어}.json.gz)
+TRANSCRIPT_LANGUAGES = ['ko', 'en']  # 자막 언어 우선순위
+TRANSCRIPT_CACHE_MAX_AGE_DAYS = 30  # 이 기간이 지난 자막은 삭제
+TRANSCRIPT_NEGATIVE_TTL_HOURS = 6  # 자막 없음 기록 유지 시간 (자동 생성 자막은 업로드 몇 시간 뒤에 생기기도 함)
+TRANSCRIPT_MAX_RETRIES = 2  # 일시적 오류 시 재시도 횟수 (모두 실패하면 다음 실행으로 연기)
+TRANSCRIPT_RETRY_BASE_DELAY = 5  # 재시도 기본 대기 시간 (초, 시도마다 2배)
+
+class TranscriptFetchError(Exception):
+    """네트워크 오류/요청 차단 등으로 자막을 가져오지 못함 (자막이 없는 것과 구분)"""
+
+class TranscriptCache:
+    """영상 ID와 언어를 키로 자막 구간(시간 정보 포함)을 gzip으로 압축 저장하는 캐시"""
+
+    def __init__(self, cache_dir=TRANSCRIPT_CACHE_DIR, max_age_days=TRANSCRIPT_CACHE_MAX_AGE_DAYS,
+                 negative_ttl_hours=TRANSCRIPT_NEGATIVE_TTL_HOURS):
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.negative_ttl_hours = negative_ttl_hours
+
+    def _path(self, video_id, language):
+        # language가 None이면 '자막 없음' 기록
+        return os.path.join(self.cache_dir, f"{video_id}.{language or 'none'}.json.gz")
+
+    def _read(self, path, max_age_seconds):
+        try:
+            if time.time() - os.path.getmtime(path) > max_age_seconds:
+                return None
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning("⚠ 자막 캐시 읽기 실패: %s", e)
+            return None
+
+    def get(self, video_id, languages):
+        """우선순위 언어 순서로 저장된 자막 항목 반환 (자막 없음 기록이면 segments가 None, 없으면 None)"""
+        for language in languages:
+            entry = self._read(self._path(video_id, language), self.max_age_days * 86400)
+            if entry is not None:
+                return entry
+        entry = self._read(self._path(video_id, None), self.negative_ttl_hours * 3600)
+        if entry is not None and set(languages) <= set(entry.get('languages', [])):
+            return entry
+        return None
+
+    def put(self, video_id, language, segments, languages=None):
+        """자막 저장 (language/segments가 None이면 languages로 찾은 자막이 없다는 기록)"""
+        path = self._path(video_id, language)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_file = f"{path}.tmp"
+            with gzip.open(temp_file, 'wt', encoding='utf-8') as f:
+                json.dump({
+                    'video_id': video_id,
+                    'language': language,
+                    'languages': languages,
+                    'fetched_at': datetime.now().isoformat(timespec='seconds'),
+                    'segments': segments,
+                }, f, ensure_ascii=False)
+            os.replace(temp_file, path)
+        except Exception as e:
+            log.warning("⚠ 자막 캐시 저장 실패: %s", e)
+
+    def prune(self):
+        """만료된 자막과 자막 없음 기록 삭제"""
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return 0
+        now = time.time()
+        removed = 0
+        for name in names:
+            if not name.endswith('.json.gz'):
+                continue
+            max_age = self.negative_ttl_hours * 3600 if name.endswith('.none.json.gz') else self.max_age_days * 86400
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            log.debug("🧹 자막 캐시 정리: %d개 삭제", removed)
+        return removed
+
+transcript_cache = TranscriptCache()
+
+def get_transcript_segments(video_id, languages=None):
+    """자막 구간 리스트 추출 ([{'text', 'start', 'duration'}, ...], 자막이 없으면 None)
+
+    캐시에 있으면 요청하지 않습니다. 일시적인 오류가 재시도 후에도 계속되거나 아직 재생할 수 없는
+    영상이면 TranscriptFetchError를 발생시킵니다 (자막 없음으로 기록하지 않음).
+    """
+    languages = languages or TRANSCRIPT_LANGUAGES
+    entry = transcript_cache.get(video_id, languages)
+    if entry is not None:
+        metrics.increment('transcript_cache_hits')
+        log.debug("   💾 자막 캐시 사용: %s (%s)", video_id, entry['language'] or '자막 없음')
+        return entry['segments']
+    
+    import youtube_transcript_api
+    # 영상에 해당 언어 자막이 없거나 연령 제한으로 볼 수 없다는 응답 (다시 요청해도 같은 결과)
+    no_caption_errors = tuple(
+        getattr(youtube_transcript_api, name)
+        for name in ('TranscriptsDisabled', 'NoTranscriptFound', 'VideoUnavailable', 'AgeRestricted')
+        if hasattr(youtube_transcript_api, name)
+    )
+    # 아직 재생할 수 없는 영상 (예정된 실시간 스트림, 프리미어 등은 나중에 자막이 생김)
+    not_ready_errors = tuple(
+        getattr(youtube_transcript_api, name)
+        for name in ('VideoUnplayable',)
+        if hasattr(youtube_transcript_api, name)
+    )
+    for attempt in range(TRANSCRIPT_MAX_RETRIES + 1):
+        try:
+            fetched = youtube_transcript_api.YouTubeTranscriptApi().fetch(video_id, languages=languages)
+        except not_ready_errors as e:
+            # 잠시 뒤에 다시 요청해도 같은 결과이므로 재시도하지 않고 다음 실행으로 연기
+            raise TranscriptFetchError(f"아직 재생할 수 없는 영상 ({type(e).__name__})") from e
+        except no_caption_errors as e:
+            log.debug("   자막 없음 (%s): %s", type(e).__name__, video_id)
+            transcript_cache.put(video_id, None, None, languages)
+            return None
+        except Exception as e:
+            metrics.increment('transcript_errors')
+            if attempt == TRANSCRIPT_MAX_RETRIES:
+                raise TranscriptFetchError(f"자막 요청 실패 ({type(e).__name__}): {str(e)[:80]}") from e
+            delay = TRANSCRIPT_RETRY_BASE_DELAY * (2 ** attempt)
+            log.warning("   ⚠ 자막 요청 실패 (%s), %s초 후 재시도 (%s/%s)",
+                        type(e).__name__, delay, attempt + 1, TRANSCRIPT_MAX_RETRIES)
+            time.sleep(delay)
+            continue
+        segments = fetched.to_raw_data()
+        transcript_cache.put(video_id, getattr(fetched, 'language_code', languages[0]), segments, languages)
+        return segments
+
+# --- 자막 정리 (입력 토큰 절약) ---
+# 자동 생성 자막의 반복/겹치는 구간, [음악] 같은 비음성 표시, 군말을 Gemini에 보내기 전에 제거
+
+TRANSCRIPT_COMPACTION = True  # False면 자막을 그대로 요약
+TRANSCRIPT_TOKEN_BUDGET = None  # 자막 최대 토큰 수 (None이면 제한 없음, 넘으면 아래 방식으로 줄임)
+TRANSCRIPT_BUDGET_MODE = 'sample'  # 'sample': 영상 전체에서 고르게 남김, 'truncate': 앞부분만 남김
+TRANSCRIPT_SAMPLE_WINDOWS = 20  # 'sample' 방식에서 영상을 나누는 구간 수
+TRANSCRIPT_FILLER_WORDS = {'어', '음', '으음', '음음', '아', '에', '그니까', 'uh', 'um', 'umm', 'uhm', 'hmm', 'er'}
+
+# [음악], [박수], [Music], (웃음), ♪ 등 (대괄호는 모두 비음성 표시로 간주, 소괄호는 알려진 표시만)
+NON_SPEECH_PATTERN = re.compile(
+    r'\[[^\]]{0,30}\]'
+    r'|\((?:음악|박수|웃음|박수 소리|웃음 소리|music|applause|laughter|laughs|inaudible|silence)\)'
+    r'|[♪♫♬]+',
+    re.IGNORECASE,
+)
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def _clean_caption_words(text):
+    """비음성 표시, 군말, 연속으로 반복된 단어를 지운 단어 리스트"""
+    words = []
+    for word in _WHITESPACE_PATTERN.split(NON_SPEECH_PATTERN.sub(' ', text)):
+        if not word or word.rstrip('.,!?…~').lower() in TRANSCRIPT_FILLER_WORDS:
+            continue
+        if words and words[-1] == word:
+            continue
+        words.append(word)
+    return words
+
+def _contains_words(words, part):
+    """part가 words 안에 연속으로 들어 있는지 확인"""
+    size = len(part)
+    return any(words[i:i + size] == part for i in range(len(words) - size + 1))
+
+def _limit_segments(segments, token_counts, budget, mode):
+    """토큰 수가 budget 이하가 되도록 구간을 골라냄 (시간 순서 유지)"""
+    if mode == 'truncate':
+        kept, total = [], 0
+        for segment, tokens in zip(segments, token_counts):
+            if total + tokens > budget:
+                break
+            kept.append(segment)
+            total += tokens
+        return kept
+    # 영상을 같은 길이의 구간들로 나누고, 각 구간의 앞부분을 같은 비율만큼 남김
+    ratio = budget / sum(token_counts)
+    window = max(1, -(-len(segments) // TRANSCRIPT_SAMPLE_WINDOWS))
+    kept = []
+    leftover = 0  # 앞 구간에서 쓰지 못한 토큰은 다음 구간으로 넘김
+    for begin in range(0, len(segments), window):
+        allowance = leftover + sum(token_counts[begin:begin + window]) * ratio
+        for index in range(begin, min(begin + window, len(segments))):
+            if token_counts[index] > allowance:
+                break
+            kept.append(segments[index])
+            allowance -= token_counts[index]
+        leftover = allowance
+    return kept
+
+def compact_transcript(segments, token_budget=None, mode=None):
+    """자막 구간을 정리하여 반환 (start/duration은 유지)
+
+    - 비음성 표시와 군말을 지우고 공백을 정리
+    - 앞 구간과 같거나 앞 구간에 포함된 구간은 앞 구간에 합침
+    - 롤링 자막처럼 앞 구간의 끝이 다시 나오면 겹친 단어를 제거
+    - token_budget이 있으면 그 이하가 되도록 구간을 골라냄
+    """
+    compacted = []
+    previous_words = []
+    for segment in segments:
+        words = _clean_caption_words(segment.get('text', ''))
+        new_words = [] if _contains_words(previous_words, words) else words
+        # 앞 구간 끝과 이번 구간 처음이 겹치는 가장 긴 단어열 제거
+        for overlap in range(min(len(previous_words), len(new_words)), 0, -1):
+            if previous_words[-overlap:] == new_words[:overlap]:
+                new_words = new_words[overlap:]
+                break
+        if not new_words:
+            if compacted:
+                # 내용은 버리고 시간만 앞 구간에 합침
+                last = compacted[-1]
+                end = segment.get('start', 0) + segment.get('duration', 0)
+                last['duration'] = max(last.get('duration', 0), round(end - last.get('start', 0), 3))
+            continue
+        compacted.append({**segment, 'text': ' '.join(new_words)})
+        previous_words = words
+
+    if token_budget and compacted:
+        token_counts = [estimate_tokens(segment['text']) + 1 for segment in compacted]
+        if sum(token_counts) > token_budget:
+            compacted = _limit_segments(compacted, token_counts, token_budget, mode or TRANSCRIPT_BUDGET_MODE)
+    return compacted
+
+# --- 실행 계측 및 보고서 ---
+# 단계별 소요 시간, 채널별 피드 지연, 토큰 수, 캐시 적중률을 모아 실행마다 JSON 보고서로 저장
+RUN_REPORT_FILE = 'run_report.json'  # 실행 보고서 (실행마다 덮어씀)
+
+class RunMetrics:
+    """한 번의 실행 동안 단계별 시간과 카운터를 모으는 객체 (여러 스레드에서 동시에 기록 가능)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.timings = {}  # 단계 이름 → 소요 시간(초) 리스트
+            self.counters = {}  # 카운터 이름 → 값
+            self.feeds = []  # 채널별 피드 다운로드 기록
+
+    def observe(self, stage, seconds):
+        """단계 하나의 소요 시간 기록"""
+        with self.lock:
+            self.timings.setdefault(stage, []).append(seconds)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_feed(self, feed_url, channel_name, seconds, status):
+        """피드 하나의 다운로드 시간과 결과(ok / not_modified / error) 기록"""
+        with self.lock:
+            self.feeds.append({'channel': channel_name, 'feed_url': feed_url,
+                               'seconds': round(seconds, 3), 'status': status})
+            self.timings.setdefault('feed_fetch', []).append(seconds)
+
+    def stage_summary(self):
+        """단계별 횟수, 합계, 평균, 중앙값, p95, 최대 (초)"""
+        summary = {}
+        with self.lock:
+            timings = {stage: sorted(values) for stage, values in self.timings.items()}
+        for stage, values in timings.items():
+            summary[stage] = {
+                'count': len(values),
+                'total': round(sum(values), 3),
+                'avg': round(sum(values) / len(values), 3),
+                'p50': round(values[len(values) // 2], 3),
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                'max': round(values[-1], 3),
+            }
+        return summary
+
+    def build_report(self, stats):
+        """JSON으로 저장할 실행 보고서 생성"""
+        finished_at = time.time()
+        with self.lock:
+            counters = dict(self.counters)
+            feeds = sorted(self.feeds, key=lambda feed: feed['seconds'], reverse=True)
+        hits = counters.get('summary_cache_hits', 0)
+        misses = counters.get('summary_cache_misses', 0)
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'finished_at': datetime.fromtimestamp(finished_at).isoformat(timespec='seconds'),
+            'duration_seconds': round(finished_at - self.started_at, 3),
+            'videos': dict(stats),
+            'counters': counters,
+            'stages': self.stage_summary(),
+            'summary_cache': {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+            },
+            'gemini_usage_today': gemini_pool.usage_by_slot() if gemini_pool else None,
+            'feeds': feeds,  # 느린 채널부터
+        }
+
+    def write_json(self, report, filepath):
+        try:
+            _write_json_atomic(filepath, report)
+            log.debug("📄 실행 보고서 저장: %s", filepath)
+        except Exception as e:
+            log.warning("⚠ 실행 보고서 저장 실패: %s", e)
+
+    def write_prometheus(self, report, filepath):
+        """node_exporter textfile collector 형식으로 저장"""
+        lines = [
+            '# HELP tubeletter_run_duration_seconds Duration of the last run.',
+            '# TYPE tubeletter_run_duration_seconds gauge',
+            f'tubeletter_run_duration_seconds {report["duration_seconds"]}',
+            '# HELP tubeletter_last_run_timestamp_seconds Unix time the last run finished.',
+            '# TYPE tubeletter_last_run_timestamp_seconds gauge',
+            f'tubeletter_last_run_timestamp_seconds {time.time():.0f}',
+            '# HELP tubeletter_videos Videos handled in the last run by result.',
+            '# TYPE tubeletter_videos gauge',
+        ]
+        lines += [f'tubeletter_videos{{result="{name}"}} {value}' for name, value in report['videos'].items()]
+        lines += [
+            '# HELP tubeletter_events Counters from the last run.',
+            '# TYPE tubeletter_events gauge',
+        ]
+        lines += [f'tubeletter_events{{name="{name}"}} {value}' for name, value in report['counters'].items()]
+        lines += [
+            '# HELP tubeletter_stage_seconds Time spent per pipeline stage in the last run.',
+            '# TYPE tubeletter_stage_seconds summary',
+        ]
+        for stage, values in report['stages'].items():
+            lines.append(f'tubeletter_stage_seconds{{stage="{stage}",quantile="0.5"}} {values["p50"]}')
+            lines.append(f'tubeletter_stage_seconds{{stage="{stage}",quantile="0.95"}} {values["p95"]}')
+            lines.append(f'tubeletter_stage_seconds_sum{{stage="{stage}"}} {values["total"]}')
+            lines.append(f'tubeletter_stage_seconds_count{{stage="{stage}"}} {values["count"]}')
+        lines += [
+            '# HELP tubeletter_summary_cache_lookups Summary cache lookups in the last run.',
+            '# TYPE tubeletter_summary_cache_lookups gauge',
+            f'tubeletter_summary_cache_lookups{{result="hit"}} {report["summary_cache"]["hits"]}',
+            f'tubeletter_summary_cache_lookups{{result="miss"}} {report["summary_cache"]["misses"]}',
+            '# HELP tubeletter_feed_fetch_seconds Feed download time per channel in the last run.',
+            '# TYPE tubeletter_feed_fetch_seconds gauge',
+        ]
+        for feed in report['feeds']:
+            channel = str(feed['channel']).replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'tubeletter_feed_fetch_seconds{{channel="{channel}",status="{feed["status"]}"}} {feed["seconds"]}')
+        if WORKER_SHARD_COUNT > 1:
+            # 샤드 작업자들의 파일이 같은 시계열로 겹치지 않도록 shard 레이블 추가
+            shard_label = f'shard="{WORKER_SHARD_INDEX}"'
+            for index, line in enumerate(lines):
+                if line.startswith('#'):
+                    continue
+                brace, space = line.find('{'), line.find(' ')
+                if brace != -1 and brace < space:
+                    lines[index] = f"{line[:brace + 1]}{shard_label},{line[brace + 1:]}"
+                else:
+                    lines[index] = f"{line[:space]}{{{shard_label}}}{line[space:]}"
+        try:
+            # textfile collector가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체
+            temp_file = f"{filepath}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(temp_file, filepath)
+        except Exception as e:
+            log.warning("⚠ Prometheus 파일 저장 실패: %s", e)
+
+metrics = RunMetrics()
+
+# --- 처리 파이프라인 ---
+# 피드 탐색 → 자막 추출 → Gemini 요약 → 이메일 전송 단계를 크기 제한 큐로 연결하고,
+# 단계마다 별도의 작업자 스레드를 두어 전체 처리량이 가장 느린 단계에 맞춰지도록 함
+_PIPELINE_DONE = object()  # 단계 종료 신호
+
+SUMMARY_PROMPT_TEMPLATE = """다음 유튜브 영상의 내용을 상세하게 분석하고 요약해줘.
+
+[요약 지침]
+1. 영상의 핵심 주제와 배경을 명확히 설명
+2. 주요 논점을 3-5개의 섹션으로 구조화 (번호 매기기)
+3. 각 섹션마다 구체적인 내용과 근거 포함
+4. 중요한 발언, 수치, 날짜 등은 반드시 언급
+5. 결론 또는 시사점 추가
+6. 전문적이고 상세하게 작성 (최소 500자 이상)
+
+[영상 제목]
+{title}
+
+[영상 내용]
+{content}
+
+위 내용을 바탕으로 전문적이고 상세한 요약을 작성해줘."""
+
+SUMMARY_GENERATION_CONFIG = {
+    "temperature": 0.3,  # 일관성 있는 요약을 위해 낮게 설정
+    "top_p": 0.9,
+    "top_k": 40,
+    "max_output_tokens": 4096,  # 상세한 요약을 위해 토큰 증가
+}
+
+# 긴 자막 분할 요약 (map: 조각별 요약 → reduce: 조각 요약을 하나로 합침)
+CHUNK_PROMPT_TEMPLATE = """다음은 유튜브 영상 자막의 일부분(파트 {part}/{total})이야.
+이 부분에 나오는 주요 논점, 중요한 발언, 수치, 날짜를 빠짐없이 정리해줘.
+다른 파트와 합쳐 최종 요약을 만들 예정이니 서론과 결론 없이 내용만 작성해줘.
+
+[영상 제목]
+{title}
+
+[자막 파트 {part}/{total}]
+{content}"""
+
+REDUCE_PROMPT_TEMPLATE = """다음은 긴 유튜브 영상의 자막을 여러 파트로 나누어 정리한 내용이야.
+파트별 정리를 하나로 합쳐서 영상 전체의 내용을 상세하게 요약해줘.
+
+[요약 지침]
+1. 영상의 핵심 주제와 배경을 명확히 설명
+2. 주요 논점을 3-5개의 섹션으로 구조화 (번호 매기기)
+3. 각 섹션마다 구체적인 내용과 근거 포함
+4. 중요한 발언, 수치, 날짜 등은 반드시 언급
+5. 결론 또는 시사점 추가
+6. 전문적이고 상세하게 작성 (최소 500자 이상)
+7. 파트 사이에 반복되는 내용은 한 번만 정리
+
+[영상 제목]
+{title}
+
+[파트별 정리]
+{content}
+
+위 내용을 바탕으로 전문적이고 상세한 요약을 작성해줘."""
+
+CHUNK_GENERATION_CONFIG = {**SUMMARY_GENERATION_CONFIG, "max_output_tokens": 2048}
+
+def print_quota_exceeded_help():
+    """Gemini API 한도 초과 시 안내 메시지 출력 (오류 수준에서도 전부 보이도록 한 메시지로 기록)"""
+    ruler = '='*60
+    log.error(
+        "\n%s\n"
+        "❌ Gemini API 무료 요금제 한도 초과\n"
+        "%s\n"
+        "📋 문제: API 요청 한도에 도달했습니다.\n"
+        "\n📊 무료 요금제 한도:\n"
+        "   • 분당 요청: %s회\n"
+        "   • 일일 요청: %s회\n"
+        "   • 분당 입력 토큰: %s개\n"
+        "   • 일일 입력 토큰: %s개\n"
+        "\n✅ 해결 방법:\n"
+        "   1️⃣ 내일까지 기다리기 (24시간 후 리셋)\n"
+        "   2️⃣ 유료 요금제 업그레이드\n"
+        "      🔗 https://ai.google.dev/pricing\n"
+        "   3️⃣ 다른 API 키 사용 (.env의 GEMINI_API_KEYS에 추가하면 키마다 한도가 따로 적용)\n"
+        "\n📖 참고 자료:\n"
+        "   🔗 https://ai.google.dev/gemini-api/docs/rate-limits\n"
+        "   🔗 https://ai.dev/usage?tab=rate-limit\n"
+        "%s\n",
+        ruler, ruler,
+        GEMINI_FREE_TIER_LIMITS['requests_per_minute'],
+        GEMINI_FREE_TIER_LIMITS['requests_per_day'],
+        format(GEMINI_FREE_TIER_LIMITS['input_tokens_per_minute'], ','),
+        format(GEMINI_FREE_TIER_LIMITS['input_tokens_per_day'], ','),
+        ruler,
+    )
+
+def _apply_stage(handler, item):
+    """handler(항목)의 결과 반환 (에러가 나면 해당 영상만 건너뛰도록 None 반환)"""
+    try:
+        return handler(item)
+    except Exception as e:
+        # Gemini 한도 초과 등은 요약 단계에서 연기로 처리하므로 여기에는 예상하지 못한 에러만 옴
+        log.warning("⚠ 영상 처리 중 오류: %.80s", e)
+        return None
+
+def _run_serial(handlers, item):
+    """단계들을 현재 스레드에서 차례로 실행 (검토 모드: 사용자가 확인한 뒤에 다음 영상을 요약)"""
+    for handler in handlers:
+        item = _apply_stage(handler, item)
+        if item is None:
+            return
+
+def _run_stage(name, handler, in_queue, out_queue, workers, stop_event):
+    """파이프라인 단계 하나를 작업자 스레드 workers개로 실행
+
+    in_queue에서 항목을 꺼내 handler(항목)의 결과를 out_queue에 넣습니다.
+    handler가 None을 반환하면 해당 항목은 다음 단계로 넘어가지 않습니다.
+    모든 작업자가 끝나면 out_queue에 종료 신호를 넣는 스레드를 반환합니다.
+    """
+    def worker():
+        while True:
+            item = in_queue.get()
+            if item is _PIPELINE_DONE:
+                in_queue.put(_PIPELINE_DONE)  # 같은 단계의 다른 작업자에게도 종료 전달
+                return
+            if stop_event.is_set():
+                continue  # 중단 요청 후 남은 항목은 버림
+            result = _apply_stage(handler, item)
+            if result is not None and out_queue is not None:
+                out_queue.put(result)
+
+    threads = [
+        threading.Thread(target=worker, name=f"{name}-{i + 1}", daemon=True)
+        for i in range(max(1, workers))
+    ]
+    for thread in threads:
+        thread.start()
+
+    def close_stage():
+        for thread in threads:
+            thread.join()
+        if out_queue is not None:
+            out_queue.put(_PIPELINE_DONE)
+
+    closer = threading.Thread(target=close_stage, name=f"{name}-closer", daemon=True)
+    closer.start()
+    return closer
+
+def discover_new_videos(feed_results, feed_cache, time_threshold, stats):
+    """피드 결과에서 새로 처리할 영상을 찾아 하나씩 반환 (피드 순서 유지)"""
+    for feed_url, feed, fetch_error in feed_results:
+        try:
+            if fetch_error is not None:
+                raise fetch_error
+            if feed is FEED_NOT_MODIFIED:
+                stats['skipped_unchanged'] += 1
+                log.debug("⏭ 스킵 (변경 없음): %s", feed_cache.get(feed_url, {}).get('channel_name', 'Unknown'))
+                continue
+            channel_name = feed.feed.title if hasattr(feed.feed, 'title') else 'Unknown'
+            
+            log.debug("\n%s", '=' * 60)
+            log.debug("📡 채널: %s", channel_name)
+            log.debug("   피드: %.60s...", feed_url)
+            log.debug("   총 %d개의 영상 발견", len(feed.entries))
+            
+            channel_new = 0
+            threshold_timestamp = time_threshold.timestamp()
+            high_water = feed_cache.get(feed_url, {}).get('high_water') if INCREMENTAL_FEED_SCAN else None
+            
+            for index, entry in enumerate(feed.entries):
+                try:
+                    video_id = entry.yt_videoid
+                    # 게시 시각 (published_parsed/updated_parsed는 UTC, 없으면 처리 대상)
+                    published_timestamp = _entry_timestamp(entry)
+                    
+                    # 1. 이전 실행에서 확인을 마친 지점 도달 → 피드가 최신순이므로 나머지는 모두 확인됨
+                    if _reached_high_water(high_water, video_id, published_timestamp):
+                        remaining = len(feed.entries) - index
+                        stats['skipped_cached'] += remaining
+                        log.debug("   ⏭ 이전 실행에서 확인한 영상부터 %d개 생략", remaining)
+                        break
+                    
+                    # 2. 캐시 확인 (이미 처리한 영상)
+                    if video_id in processed_videos:
+                        stats['skipped_cached'] += 1
+                        log.debug("   ⏭ 스킵 (캐시됨): %.50s...", entry.title)
+                        continue
+                    
+                    # 3. 게시 시간 확인 (최근 HOURS_TO_CHECK 시간 이내인지)
+                    if published_timestamp is not None and published_timestamp < threshold_timestamp:
+                        if log.isEnabledFor(logging.DEBUG):
+                            age_hours = (time.time() - published_timestamp) / 3600
+                            log.debug("   ⏭ 스킵 (오래됨): %.50s... (%.1f시간 전)", entry.title, age_hours)
+                        if INCREMENTAL_FEED_SCAN:
+                            # 이후 항목은 더 오래된 영상
+                            stats['skipped_old'] += len(feed.entries) - index
+                            break
+                        stats['skipped_old'] += 1
+                        continue
+                    
+                    # 4. 새 영상 발견 → 파이프라인으로 전달
+                    log.info("\n%s", '─'*60)
+                    log.info("🎥 새 영상 발견: %s", entry.title)
+                    log.info("   📺 채널: %s", channel_name)
+                    log.info("   📌 Video ID: %s", video_id)
+                    log.info("   🔗 Link: %s", entry.link)
+                    if hasattr(entry, 'published'):
+                        log.info("   📅 게시: %s", entry.published)
+                    
+                    channel_new += 1
+                    yield {
+                        'video_id': video_id,
+                        'title': entry.title,
+                        'link': entry.link,
+                        'published': entry.get('published', 'N/A'),
+                        'description': entry.get('summary', ''),
+                        'channel_id': feed_url.rsplit('channel_id=', 1)[-1],
+                        'channel_name': channel_name,
+                        'feed_url': feed_url,
+                    }
+                
+                except Exception as e:
+                    log.warning("⚠ 영상 처리 중 오류: %.80s", e)
+                    continue
+            
+            log.debug("📊 채널 '%s' 탐색 완료: %d개 새 영상", channel_name, channel_new)
+                
+        except Exception as e:
+            log.warning("⚠ 피드 처리 중 오류: %s", e)
+            continue
+
+def make_transcript_stage(retry_videos):
+    """파이프라인 2단계: 자막 가져오기 (일시적 오류가 계속되면 영상을 retry_videos에 넣고 다음 실행으로 연기)"""
+    def transcript_stage(video):
+        started = time.perf_counter()
+        try:
+            segments = get_transcript_segments(video['video_id'])
+        except TranscriptFetchError as e:
+            # 처리 완료로 기록하지 않으므로 다음 실행에서 다시 발견됨
+            retry_videos.append(video)
+            log.warning("   ⏸ 자막을 가져오지 못해 다음 실행으로 연기: %.40s... (%s)", video['title'], e)
+            return None
+        finally:
+            metrics.observe('transcript', time.perf_counter() - started)
+        return attach_transcript(video, segments)
+    return transcript_stage
+
+def attach_transcript(video, segments):
+    """자막(없거나 정리 후 남은 내용이 없으면 제목/설명)을 요약할 내용으로 영상에 추가"""
+    compacted = None
+    if segments and TRANSCRIPT_COMPACTION:
+        compacted = compact_transcript(segments, TRANSCRIPT_TOKEN_BUDGET)
+        if not compacted:
+            # 비음성 표시뿐이거나 첫 구간부터 토큰 예산을 넘으면 원래 자막 대신 제목/설명 사용
+            log.info("   ⚠ 정리 후 남은 자막 없음: %.40s...", video['title'])
+            segments = None
+    metrics.increment('transcripts_found' if segments else 'transcripts_missing')
+    if segments:
+        transcript = " ".join(segment['text'] for segment in segments)
+        saved_note = ""
+        if compacted is not None:
+            compacted_text = " ".join(segment['text'] for segment in compacted)
+            bytes_saved = len(transcript.encode('utf-8')) - len(compacted_text.encode('utf-8'))
+            tokens_saved = estimate_tokens(transcript) - estimate_tokens(compacted_text)
+            metrics.increment('transcript_bytes_saved', bytes_saved)
+            metrics.increment('transcript_tokens_saved', tokens_saved)
+            saved_note = f", 정리로 {bytes_saved:,}바이트/약 {tokens_saved:,}토큰 절약"
+            segments, transcript = compacted, compacted_text
+        log.info("   ✅ 자막 추출 성공: %.40s... (길이: %d자%s)", video['title'], len(transcript), saved_note)
+        video['segments'] = segments
+        video['content'] = transcript
+    else:
+        log.warning("   ⚠ 자막 없음, 제목/설명으로 진행: %.40s...", video['title'])
+        video['content'] = f"제목: {video['title']}\n설명: {video['description']}"
+    return video
+
+def _is_quota_error(error):
+    """Gemini 한도 초과(429) 에러인지 확인"""
+    error_msg = str(error)
+    return "429" in error_msg or "quota" in error_msg.lower() or "ResourceExhausted" in str(type(error))
+
+def _summary_cache_key(prompt_template, fields, config=SUMMARY_GENERATION_CONFIG):
+    """요약 캐시 키 (대체 모델이나 배치 작업으로 만든 요약도 첫 번째 모델의 키로 저장하여 재사용)"""
+    return SummaryCache.make_key(gemini_pool.models[0], prompt_template, fields, config)
+
+def call_gemini(prompt_template, fields, config=SUMMARY_GENERATION_CONFIG):
+    """prompt_template에 fields를 채워 Gemini 호출
+
+    gemini_pool에서 한도가 남은 API 키/모델을 골라 요청하고, 429/403/404/5xx(또는 시간 초과)를 받으면 그 키/모델을
+    쉬게 한 뒤 다른 키/모델로 다시 보냅니다. 모든 키/모델의 일일 한도에 도달하면
+    GeminiQuotaExhausted를, 재시도가 모두 실패하거나 응답이 비어 있으면 GeminiRequestDeferred를 발생시킵니다.
+    같은 요청의 응답이 summary_cache에 있으면 API를 호출하지 않습니다.
+    """
+    cache_key = _summary_cache_key(prompt_template, fields, config)
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        log.debug("   💾 요약 캐시 사용: %.40s...", fields.get('title', ''))
+        return cached_summary
+    
+    prompt = prompt_template.format(**fields)
+    estimated_tokens = estimate_tokens(prompt)
+    max_attempts = GEMINI_MAX_RETRIES + len(gemini_pool.slots)
+    
+    for attempt in range(max_attempts):
+        slot = gemini_pool.acquire(estimated_tokens)
+        try:
+            # 새 API 사용법 (상세 요약을 위한 설정 추가)
+            started = time.perf_counter()
+            response = gemini_pool.client(slot).models.generate_content(
+                model=slot['model'],
+                contents=prompt,
+                config=config,
+            )
+            metrics.observe('gemini', time.perf_counter() - started)
+            gemini_pool.report_success(slot)
+            usage = getattr(response, 'usage_metadata', None)
+            prompt_tokens = getattr(usage, 'prompt_token_count', None)
+            slot['limiter'].record_actual(estimated_tokens, prompt_tokens)
+            metrics.increment('gemini_requests')
+            if slot['model'] != gemini_pool.models[0]:
+                metrics.increment('gemini_fallback_requests')
+            metrics.increment('gemini_prompt_tokens', prompt_tokens or estimated_tokens)
+            metrics.increment('gemini_response_tokens', getattr(usage, 'candidates_token_count', None) or 0)
+        except Exception as gemini_error:
+            metrics.increment('gemini_errors')
+            if gemini_pool.report_failure(slot, gemini_error) is None:
+                log.error("   ❌ 요약 생성 실패: %s", gemini_error)
+                raise
+            metrics.increment('gemini_failovers')
+            if attempt == max_attempts - 1:
+                # 쉬고 있는 슬롯은 휴식이 끝나면 다음 영상에서 다시 사용
+                raise GeminiRequestDeferred(f"Gemini 오류 응답 {max_attempts}회 연속") from gemini_error
+            continue
+        
+        # 안전 필터 차단 등으로 응답 후보가 비어 있으면 text가 None (캐시하지 않고 다음 실행으로 연기)
+        summary = response.text
+        if not summary:
+            metrics.increment('gemini_empty_responses')
+            raise GeminiRequestDeferred(f"Gemini 빈 응답 ({_gemini_finish_reason(response)})")
+        summary_cache.put(cache_key, slot['model'], summary)
+        return summary
+
+def _gemini_finish_reason(response):
+    """빈 응답의 원인 (차단 사유 또는 첫 후보의 finish_reason, 알 수 없으면 'unknown')"""
+    feedback = getattr(response, 'prompt_feedback', None)
+    block_reason = getattr(feedback, 'block_reason', None)
+    if block_reason:
+        return f"차단: {getattr(block_reason, 'name', block_reason)}"
+    candidates = getattr(response, 'candidates', None) or []
+    finish_reason = getattr(candidates[0], 'finish_reason', None) if candidates else None
+    return getattr(finish_reason, 'name', finish_reason) or 'unknown'
+
+def split_transcript(segments, max_tokens=CHUNK_MAX_TOKENS):
+    """자막 구간을 경계에서 끊어 max_tokens 이하의 텍스트 조각 리스트로 분할"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for segment in segments:
+        text = segment['text'].strip()
+        if not text:
+            continue
+        tokens = estimate_tokens(text) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def summarize_long_transcript(title, segments):
+    """긴 자막을 조각별로 동시에 요약(map)한 뒤 하나의 요약으로 합침(reduce)"""
+    chunks = split_transcript(segments, CHUNK_MAX_TOKENS)
+    log.info("   ✂ 긴 자막 분할 요약: %.40s... (%d개 조각)", title, len(chunks))
+    with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_SUMMARY_WORKERS, len(chunks)))) as executor:
+        futures = [
+            executor.submit(
+                call_gemini, CHUNK_PROMPT_TEMPLATE,
+                {'title': title, 'part': index, 'total': len(chunks), 'content': chunk},
+                CHUNK_GENERATION_CONFIG,
+            )
+            for index, chunk in enumerate(chunks, 1)
+        ]
+        # 조각 순서대로 결과 수집 (하나라도 실패하면 예외가 그대로 전달됨)
+        partial_summaries = [future.result() for future in futures]
+    
+    combined = "\n\n".join(
+        f"[파트 {index}/{len(chunks)}]\n{partial}" for index, partial in enumerate(partial_summaries, 1)
+    )
+    return call_gemini(REDUCE_PROMPT_TEMPLATE, {'title': title, 'content': combined})
+
+def generate_summary(title, content_to_analyze, segments=None):
+    """Gemini로 영상 요약 생성 (긴 자막은 자동으로 분할 요약)"""
+    if segments and estimate_tokens(content_to_analyze) > CHUNK_THRESHOLD_TOKENS:
+        return summarize_long_transcript(title, segments)
+    return call_gemini(SUMMARY_PROMPT_TEMPLATE, {'title': title, 'content': content_to_analyze})
+
+def make_summarize_stage(deferred_videos, batch_channels=frozenset()):
+    """파이프라인 3단계: Gemini 요약 생성 (한도 도달 시 영상을 deferred_videos에 넣고 다음 실행으로 연기)
+
+    batch_channels에 속한 채널의 영상은 배치 대기열에 저장하고 다음 단계로 넘기지 않습니다
+    (분할 요약이 필요한 긴 자막은 바로 요약).
+    """
+    def summarize_stage(video):
+        if (video.get('channel_id') in batch_channels
+                and estimate_tokens(video['content']) <= CHUNK_THRESHOLD_TOKENS):
+            fields = {'title': video['title'], 'content': video['content']}
+            cached_summary = summary_cache.get(_summary_cache_key(SUMMARY_PROMPT_TEMPLATE, fields))
+            if cached_summary is None:
+                enqueue_batch_request(video)
+                log.info("   📦 배치 요약 대기열에 저장: %.40s...", video['title'])
+                return None
+            video['summary'] = cached_summary
+            return video
+        log.info("   ⏳ Gemini 요약 생성 중: %.40s...", video['title'])
+        try:
+            summary = generate_summary(video['title'], video['content'], video.get('segments'))
+        except (GeminiQuotaExhausted, GeminiRequestDeferred) as e:
+            deferred_videos.append(video)
+            log.info("   ⏸ 다음 실행으로 연기: %.40s... (%s)", video['title'], e)
+            return None
+        log.info("   ✅ 요약 생성 완료: %.40s...", video['title'])
+        log.info("   📝 요약 길이: %d자", len(summary))
+        log.debug("   📝 요약 내용:\n%s\n%s\n%s", '-' * 60, summary, '-' * 60)
+        video['summary'] = summary
+        return video
+    return summarize_stage
+
+def build_email_body(video):
+    """요약 이메일 본문(마크다운) 생성"""
+    return f"""
+═══════════════════════════════════════════════════
+📺 YouTube 영상 요약
+═══════════════════════════════════════════════════
+
+🎬 제목: {video['title']}
+
+🔗 링크: {video['link']}
+
+📅 게시일: {video['published']}
+
+═══════════════════════════════════════════════════
+📝 요약 내용
+═══════════════════════════════════════════════════
+
+{video['summary']}
+
+═══════════════════════════════════════════════════
+🤖 이 요약은 TubeLetter에 의해 자동 생성되었습니다.
+═══════════════════════════════════════════════════
+"""
+
+def render_summary_html(video):
+    """요약 마크다운을 HTML로 변환 (영상마다 한 번만 변환하여 모든 수신자 그룹이 재사용)"""
+    if video.get('summary_html') is None:
+        video['summary_html'] = render_markdown(video['summary'])
+        metrics.increment('summaries_rendered')
+    return video['summary_html']
+
+def build_video_html(video, section_id=None):
+    """영상 하나의 제목/정보/요약 HTML 조각"""
+    id_attribute = f' id="{section_id}"' if section_id else ''
+    return (
+        f'<div class="video"{id_attribute}>'
+        f'<h2>{html.escape(video["title"])}</h2>'
+        f'<p>📺 {html.escape(video["channel_name"])} · 📅 {html.escape(video["published"])} · '
+        f'<a href="{html.escape(video["link"])}">🔗 영상 보기</a></p>'
+        f'{render_summary_html(video)}</div>'
+    )
+
+def build_video_email(video):
+    """영상 하나의 요약 이메일 (제목, 텍스트 본문, HTML 반환)"""
+    html_body = (
+        f"<h1>📺 YouTube 영상 요약</h1>{build_video_html(video)}"
+        f"<p><em>🤖 이 요약은 TubeLetter에 의해 자동 생성되었습니다.</em></p>"
+    )
+    return f"[요약] {video['title']}", build_email_body(video), wrap_html(html_body)
+
+def build_digest(videos, group=None):
+    """여러 영상 요약을 채널별 목차가 있는 하나의 이메일로 구성 (제목, 텍스트 본문, HTML 반환)"""
+    # 채널별로 묶기 (처음 등장한 채널 순서 유지)
+    channels = {}
+    for video in videos:
+        channels.setdefault(video['channel_name'], []).append(video)
+    
+    group_label = f" {group['name']}" if group and group['name'] != DEFAULT_RECIPIENT_GROUP else ''
+    subject = f"[요약] {datetime.now().strftime('%Y-%m-%d')}{group_label} 다이제스트 ({len(videos)}개 영상)"
+    
+    text_parts = [f"📺 YouTube 영상 요약 다이제스트 ({len(videos)}개 영상)\n", "📑 목차"]
+    toc_html = []
+    ordered_videos = []
+    for channel_name, channel_videos in channels.items():
+        text_parts.append(f"\n📡 {channel_name}")
+        toc_items = []
+        for video in channel_videos:
+            ordered_videos.append(video)
+            number = len(ordered_videos)
+            text_parts.append(f"  {number}. {video['title']}")
+            toc_items.append(f'<li><a href="#video-{number}">{html.escape(video["title"])}</a></li>')
+        toc_html.append(f"<li><strong>{html.escape(channel_name)}</strong><ol>{''.join(toc_items)}</ol></li>")
+    
+    # 본문도 목차와 같은 순서 (채널별)로 배치
+    sections_html = []
+    for number, video in enumerate(ordered_videos, 1):
+        text_parts.append(build_email_body(video))
+        sections_html.append(build_video_html(video, f"video-{number}"))
+    
+    html_body = (
+        f"<h1>📺 YouTube 영상 요약 다이제스트</h1>"
+        f'<div class="toc"><h3>📑 목차</h3><ul>{"".join(toc_html)}</ul></div>'
+        + "".join(sections_html)
+    )
+    return subject, "\n".join(text_parts), wrap_html(html_body)
+
+def prepare_delivery(video, groups):
+    """영상 요약을 받을 수신자 그룹과 그룹별 이메일 목록 ([(그룹, (제목, 본문, HTML) 또는 None)])
+
+    이메일 본문은 영상마다 한 번만 만들고 (다이제스트 그룹은 HTML 요약만 만들어 둠),
+    DB 잠금을 잡기 전에 변환을 끝내 둡니다.
+    """
+    deliveries = []
+    email = None
+    for group in groups:
+        if not group_accepts_video(group, video):
+            continue
+        if group['schedule'] == 'immediate':
+            if email is None:
+                email = build_video_email(video)
+            deliveries.append((group, email))
+        else:
+            render_summary_html(video)
+            deliveries.append((group, None))
+    return deliveries
+
+def store_delivery(db, video, deliveries):
+    """prepare_delivery()의 결과를 발송 대기열/다이제스트 항목으로 저장하고 처리 기록 추가
+
+    호출하는 쪽의 트랜잭션 안에서 실행하므로 이메일 저장과 처리 기록이 함께 저장되거나 함께 취소됩니다
+    (중간에 종료되어도 다른 작업자가 같은 영상을 다시 보내지 않음). 기록한 상태를 반환합니다.
+    """
+    for group, email in deliveries:
+        if email is not None:
+            subject, body, html_content = email
+            _insert_outbox(db, subject, body, html_content, [video['video_id']], group['recipients'])
+        else:
+            _insert_digest_item(db, group, video)
+    status = 'queued' if deliveries else 'skipped'
+    _record_processed_video(db, video, status)
+    return status
+
+def deliver_to_groups(video, groups):
+    """영상 요약을 수신자 그룹마다 저장하고 처리 완료로 기록 (한 트랜잭션, 받은 그룹 수 반환)"""
+    deliveries = prepare_delivery(video, groups)
+    db = get_state_db()
+    with _state_lock, db:
+        store_delivery(db, video, deliveries)
+    processed_videos.add(video['video_id'])
+    return len(deliveries)
+
+def make_delivery_stage(stats, stop_event, interactive=False, auto_send=False):
+    """파이프라인 4단계: 이메일 전송 및 처리 완료 기록
+
+    interactive가 True면 영상마다 전송 여부와 계속 진행 여부를 사용자에게 묻고,
+    아니면 auto_send에 따라 묻지 않고 전송하거나 건너뜁니다.
+    묻지 않고 건너뛴 영상은 처리 기록에 남기지 않아 전송하는 다음 실행에서 다시 발견됩니다
+    (요약은 캐시에 있으므로 Gemini 한도를 다시 쓰지 않음).
+    다이제스트 그룹에 보낼 요약은 모아 두었다가 실행이 끝날 때(daily 그룹은 발송 시각에) 한 번에 보냅니다.
+    """
+    groups = get_recipient_groups()
+    
+    def delivery_stage(video):
+        if not interactive and not auto_send:
+            log.info("   ⏭ 이메일 전송 안 함 (--no-send, 처리 기록 없음): %.50s...\n", video['title'])
+            stats['processed'] += 1
+            return None
+        
+        # 6. 이메일 전송 여부 확인
+        if interactive and not auto_send:
+            log.info("\n%s", '─'*60)
+            log.info("🎬 %s", video['title'])
+            send_choice = input("📧 이메일을 전송하시겠습니까? (y: 전송 / n: 스킵): ").strip().lower()
+            log.info("%s", '─'*60)
+        else:
+            send_choice = 'y'
+
+        if send_choice == 'y':
+            # 발송 대기열/다이제스트 항목 저장과 처리 기록을 함께 저장 (실제 발송은 OutboxWorker가 담당)
+            delivered = deliver_to_groups(video, groups)
+            log.info("   📮 발송 대기열에 저장 (수신자 그룹 %s개)", delivered)
+        else:
+            mark_video_processed(video, 'skipped')
+            log.info("   ⏭ 이메일 전송 스킵")
+        
+        log.info("✅ 처리 완료: %.50s...\n", video['title'])
+        stats['processed'] += 1
+        
+        # 사용자 확인 받기 (계속 진행 여부)
+        if interactive:
+            log.info("%s", '─'*60)
+            user_input = input("⏸ 다음 영상을 처리하시겠습니까? (Enter: 계속 / q: 종료): ").strip().lower()
+            if user_input == 'q':
+                log.info("\n🛑 사용자 요청으로 프로그램 종료")
+                stop_event.set()
+            log.info("%s\n", '─'*60)
+        return None
+    return delivery_stage
+
+# --- Gemini 배치 요약 (급하지 않은 채널) ---
+# mode가 batch인 채널의 영상은 바로 요약하지 않고 batch_requests 테이블에 프롬프트를 모아 둠
+# 모인 요청은 JSONL 파일 하나로 Gemini 배치 작업에 제출하고(실시간 요청 한도를 쓰지 않고 더 저렴함),
+# 다음 실행(데몬 모드는 백그라운드에서 BATCH_POLL_INTERVAL마다)에서 완료된 결과를 가져와 일반 발송 경로로 보냄
+# 요청 상태: pending → submitting → submitted → collecting → (삭제) / 실패하면 pending으로 돌아가 다시 제출
+BATCH_DIR = 'batch_jobs'  # 제출할 요청 파일(JSONL)을 만드는 폴더
+BATCH_MIN_REQUESTS = 10  # 대기 중인 요청이 이만큼 모이면 배치 작업 제출
+BATCH_MAX_PENDING_SECONDS = 3600  # 가장 오래된 요청이 이보다 오래 기다렸으면 개수가 적어도 제출 (초)
+BATCH_MAX_ATTEMPTS = 3  # 배치 작업에서 실패한 요청을 다시 제출하는 최대 횟수
+BATCH_POLL_INTERVAL = 300  # 데몬 모드에서 배치 작업 완료를 확인하는 간격 (초)
+BATCH_CLAIM_LEASE_SECONDS = 600  # 제출/결과 처리 중 작업자가 종료되면 다른 작업자가 다시 가져갈 때까지의 시간 (초)
+BATCH_VIDEO_FIELDS = ('video_id', 'title', 'link', 'published', 'description', 'channel_id', 'channel_name', 'feed_url')
+
+class BatchBackend(abc.ABC):
+    """배치 작업 백엔드 인터페이스 (GeminiBatchBackend, 벤치마크의 가짜 백엔드)"""
+
+    @abc.abstractmethod
+    def submit(self, jsonl_path, model, display_name):
+        """{"key", "request"} 줄로 된 JSONL 요청 파일을 제출하고 작업 이름 반환"""
+
+    @abc.abstractmethod
+    def status(self, job_name):
+        """작업 상태: 'running', 'succeeded', 'failed' 중 하나"""
+
+    @abc.abstractmethod
+    def results(self, job_name):
+        """{key: 요약 텍스트 (해당 요청이 실패했으면 None)}"""
+
+class GeminiBatchBackend(BatchBackend):
+    """google.genai Batch API (업로드한 JSONL 파일로 작업을 만들고 결과도 JSONL 파일로 받음)
+
+    작업은 제출한 API 키의 프로젝트에 속하므로 작업 이름에 키 ID를 붙여 저장합니다 ("키 ID|batches/...").
+    """
+    FAILED_STATES = {'JOB_STATE_FAILED', 'JOB_STATE_CANCELLED', 'JOB_STATE_EXPIRED'}
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def _job(self, job_name):
+        key_id, name = job_name.split('|', 1)
+        client = self.pool.client_for_key(key_id)
+        return client, client.batches.get(name=name)
+
+    def submit(self, jsonl_path, model, display_name):
+        slot = self.pool.available_slot()
+        client = self.pool.client(slot)
+        uploaded = client.files.upload(file=jsonl_path, config={'display_name': display_name, 'mime_type': 'jsonl'})
+        job = client.batches.create(model=model, src=uploaded.name, config={'display_name': display_name})
+        return f"{slot['key_id']}|{job.name}"
+
+    def status(self, job_name):
+        _, job = self._job(job_name)
+        state = getattr(job.state, 'name', str(job.state))
+        if state == 'JOB_STATE_SUCCEEDED':
+            return 'succeeded'
+        return 'failed' if state in self.FAILED_STATES else 'running'
+
+    def results(self, job_name):
+        client, job = self._job(job_name)
+        content = client.files.download(file=job.dest.file_name)
+        results = {}
+        for line in content.decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            try:
+                parts = item['response']['candidates'][0]['content']['parts']
+                results[item['key']] = "".join(part.get('text', '') for part in parts) or None
+            except (KeyError, IndexError, TypeError):
+                results[item.get('key')] = None  # 요청별 오류 ({"key", "error"})
+        return results
+
+def _batch_request_line(key, prompt, config=SUMMARY_GENERATION_CONFIG):
+    """배치 요청 파일의 한 줄 (GenerateContentRequest 형식)"""
+    return json.dumps({
+        'key': key,
+        'request': {
+            'contents': [{'role': 'user', 'parts': [{'text': prompt}]}],
+            'generation_config': config,
+        },
+    }, ensure_ascii=False)
+
+def enqueue_batch_request(video):
+    """영상 요약 요청을 배치 대기열에 저장하고 처리 기록에 batched로 기록 (한 트랜잭션, 다시 발견되지 않음)"""
+    fields = {'title': video['title'], 'content': video['content']}
+    item = {key: video.get(key) for key in BATCH_VIDEO_FIELDS}
+    now = time.time()
+    db = get_state_db()
+    with _state_lock, db:
+        db.execute(
+            "INSERT OR IGNORE INTO batch_requests (video_id, video, prompt, cache_key, status, attempts, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, 'pending', 0, ?, ?)",
+            (video['video_id'], json.dumps(item, ensure_ascii=False), SUMMARY_PROMPT_TEMPLATE.format(**fields),
+             _summary_cache_key(SUMMARY_PROMPT_TEMPLATE, fields), now, now),
+        )
+        _record_processed_video(db, video, 'batched')
+    processed_videos.add(video['video_id'])
+    metrics.increment('batch_enqueued')
+
+def submit_batch_requests(force=False):
+    """대기 중인 배치 요청을 작업 하나로 제출 (요청이 충분히 모였거나 오래 기다렸을 때, 제출한 요청 수 반환)"""
+    db = get_state_db()
+    now = time.time()
+    # 제출 도중 종료된 작업자의 요청도 다시 제출 대상
+    claimable = "(status = 'pending' OR (status = 'submitting' AND updated_at < ?))"
+    with _state_lock:
+        count, oldest = db.execute(
+            f"SELECT COUNT(*), MIN(created_at) FROM batch_requests WHERE {claimable}",
+            (now - BATCH_CLAIM_LEASE_SECONDS,),
+        ).fetchone()
+    if not count or (not force and count < BATCH_MIN_REQUESTS and now - oldest < BATCH_MAX_PENDING_SECONDS):
+        return 0
+    
+    # 다른 작업자와 겹치지 않도록 요청을 먼저 이 작업자의 임시 이름으로 가져옴
+    claim = f"submitting:{os.getpid()}:{now}"
+    with _state_lock, db:
+        db.execute(
+            f"UPDATE batch_requests SET status = 'submitting', job_name = ?, updated_at = ? WHERE {claimable}",
+            (claim, now, now - BATCH_CLAIM_LEASE_SECONDS),
+        )
+        rows = db.execute(
+            "SELECT video_id, prompt FROM batch_requests WHERE job_name = ? AND status = 'submitting'", (claim,)
+        ).fetchall()
+    if not rows:
+        return 0
+    
+    display_name = f"tubeletter-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    jsonl_path = os.path.join(BATCH_DIR, f"{display_name}.jsonl")
+    try:
+        os.makedirs(BATCH_DIR, exist_ok=True)
+        with open(jsonl_path, 'w', encoding='utf-8') as f:
+            for video_id, prompt in rows:
+                f.write(_batch_request_line(video_id, prompt) + '\n')
+        job_name = batch_backend.submit(jsonl_path, gemini_pool.models[0], display_name)
+    except Exception as e:
+        with _state_lock, db:
+            db.execute("UPDATE batch_requests SET status = 'pending', job_name = NULL WHERE job_name = ?", (claim,))
+        log.warning("⚠ 배치 작업 제출 실패, 다음 실행에서 다시 시도: %s", e)
+        return 0
+    finally:
+        if os.path.exists(jsonl_path):
+            os.remove(jsonl_path)
+    
+    with _state_lock, db:
+        db.execute(
+            "UPDATE batch_requests SET status = 'submitted', job_name = ?, updated_at = ? WHERE job_name = ?",
+            (job_name, time.time(), claim),
+        )
+    metrics.increment('batch_jobs_submitted')
+    metrics.increment('batch_requests_submitted', len(rows))
+    log.info("📦 배치 작업 제출: %s (%d개 요청)", job_name, len(rows))
+    return len(rows)
+
+def collect_batch_results(groups):
+    """완료된 배치 작업의 요약을 가져와 수신자 그룹에 발송 (가져온 요약 수 반환)
+
+    실패한 요청은 BATCH_MAX_ATTEMPTS번까지 다시 제출 대기열로 돌아갑니다.
+    """
+    db = get_state_db()
+    now = time.time()
+    claimable = "(status = 'submitted' OR (status = 'collecting' AND updated_at < ?))"
+    with _state_lock:
+        job_names = [row[0] for row in db.execute(
+            f"SELECT DISTINCT job_name FROM batch_requests WHERE {claimable}", (now - BATCH_CLAIM_LEASE_SECONDS,)
+        )]
+    
+    collected = 0
+    for job_name in job_names:
+        try:
+            state = batch_backend.status(job_name)
+            if state == 'running':
+                continue
+            # 다른 작업자가 같은 작업의 결과를 동시에 가져가지 않도록 먼저 표시
+            with _state_lock, db:
+                claimed = db.execute(
+                    f"UPDATE batch_requests SET status = 'collecting', updated_at = ? WHERE job_name = ? AND {claimable}",
+                    (time.time(), job_name, time.time() - BATCH_CLAIM_LEASE_SECONDS),
+                ).rowcount
+            if not claimed:
+                continue
+            results = batch_backend.results(job_name) if state == 'succeeded' else {}
+        except Exception as e:
+            log.warning("⚠ 배치 작업 확인 실패 (%s): %s", job_name, e)
+            continue
+        if state == 'failed':
+            log.warning("⚠ 배치 작업 실패: %s", job_name)
+        
+        with _state_lock:
+            rows = db.execute(
+                "SELECT video_id, video, cache_key, attempts FROM batch_requests WHERE job_name = ? AND status = 'collecting'",
+                (job_name,),
+            ).fetchall()
+        for video_id, video_json, cache_key, attempts in rows:
+            summary = results.get(video_id)
+            if not summary:
+                attempts += 1
+                give_up = attempts >= BATCH_MAX_ATTEMPTS
+                with _state_lock, db:
+                    db.execute(
+                        "UPDATE batch_requests SET status = ?, job_name = NULL, attempts = ?, updated_at = ? WHERE video_id = ?",
+                        ('failed' if give_up else 'pending', attempts, time.time(), video_id),
+                    )
+                    if give_up:
+                        db.execute("UPDATE processed_videos SET status = 'failed' WHERE video_id = ?", (video_id,))
+                if give_up:
+                    metrics.increment('batch_failed')
+                    log.error("   ❌ 배치 요약 포기 (%s회 실패): %s", attempts, video_id)
+                continue
+            
+            video = json.loads(video_json)
+            video['summary'] = summary
+            summary_cache.put(cache_key, gemini_pool.models[0], summary)
+            deliveries = prepare_delivery(video, groups)
+            # 발송 대기열 저장, 처리 기록, 배치 요청 삭제를 한 트랜잭션으로 (중간에 종료되어도 중복 발송이나 누락 없음)
+            with _state_lock, db:
+                status = store_delivery(db, video, deliveries)
+                db.execute("DELETE FROM batch_requests WHERE video_id = ?", (video_id,))
+            collected += 1
+            metrics.increment('batch_results')
+            log.info("   📦 배치 요약 도착: %.40s... (%s)", video['title'], status)
+    return collected
+
+def start_batch_poller(interval=BATCH_POLL_INTERVAL):
+    """데몬 모드에서 실행 사이에도 배치 작업 완료를 확인하여 발송하는 백그라운드 스레드 시작"""
+    def poll():
+        while True:
+            time.sleep(interval)
+            try:
+                if collect_batch_results(get_recipient_groups()):
+                    OutboxWorker().start().finish()
+            except Exception as e:
+                log.warning("⚠ 배치 작업 확인 중 오류: %s", e)
+    thread = threading.Thread(target=poll, name="batch-poller", daemon=True)
+    thread.start()
+    return thread
+
+# 배치 작업 백엔드 (main()에서 생성, 드라이런에서는 None)
+batch_backend = None
+
+def process_youtube_automation(interactive=False, auto_send=False, dry_run=False, max_videos=None,
+                               report_file=RUN_REPORT_FILE, prometheus_file=None, poll_all=False):
+    """한 번의 실행: 피드 확인 → 새 영상 요약 → 이메일 발송
+
+    interactive: 영상마다 전송/계속 여부를 묻는 검토 모드
+    auto_send: 묻지 않고 모든 요약을 전송 (둘 다 False면 요약만 하고 처리 기록 없이 전송은 건너뜀)
+    dry_run: 새 영상 목록만 출력 (자막/Gemini/이메일 호출 및 상태 저장 없음)
+    max_videos: 이번 실행에서 처리할 최대 새 영상 수
+    report_file: 실행 보고서(JSON) 경로 (None이면 저장하지 않음)
+    prometheus_file: Prometheus textfile 경로 (None이면 저장하지 않음)
+    poll_all: 확인 일정과 관계없이 모든 채널 확인
+    """
+    metrics.reset()
+    
+    # 시간 기준 설정 (현재 시각 - HOURS_TO_CHECK)
+    time_threshold = datetime.now(datetime.now().astimezone().tzinfo) - timedelta(hours=HOURS_TO_CHECK)
+    
+    log.debug("⏰ 시간 필터: %d시간 이내 (%s 이후)", HOURS_TO_CHECK, time_threshold.strftime('%Y-%m-%d %H:%M:%S'))
+    
+    stats = {
+        'processed': 0,  # 처리된 영상 수
+        'skipped_old': 0,  # 오래된 영상 스킵 수
+        'skipped_cached': 0,  # 캐시된 영상 스킵 수
+        'skipped_unchanged': 0,  # 변경 없는 피드 스킵 수
+    }
+    
+    # 처리 대기 중인 영상이 없는 피드만 조건부 요청 (304면 파싱 생략)
+    feed_cache = load_feed_cache()
+    pending_urls = {
+        feed_url for feed_url in RSS_FEEDS
+        if feed_url in feed_cache
+        and feed_has_pending_entries(feed_cache[feed_url], processed_videos, time_threshold)
+    }
+    conditional_urls = {feed_url for feed_url in RSS_FEEDS if feed_url in feed_cache} - pending_urls
+    
+    # 확인할 때가 된 채널만 선택 (연기된 영상이 남은 채널은 항상 포함)
+    if poll_scheduler is None or poll_all:
+        feeds_to_process = RSS_FEEDS
+    else:
+        feeds_to_process = poll_scheduler.due_feeds(CHANNELS, pending_urls)
+        log.info("📡 확인할 채널: %d/%d개", len(feeds_to_process), len(RSS_FEEDS))
+    
+    # 1. 피드를 동시에 다운로드
+    feed_results = fetch_all_feeds(feeds_to_process, feed_cache, conditional_urls)
+    
+    if dry_run:
+        # 새 영상 목록만 확인하고 종료 (피드 캐시도 저장하지 않음)
+        new_videos = 0
+        for _ in discover_new_videos(feed_results, feed_cache, time_threshold, stats):
+            new_videos += 1
+            if max_videos and new_videos >= max_videos:
+                break
+        log.info("\n🧪 드라이런: 새 영상 %s개 발견 (요약/전송 없음)", new_videos)
+        return
+    
+    save_feed_cache(feed_cache)
+    if poll_scheduler is not None:
+        channels_by_url = {channel['feed_url']: channel for channel in CHANNELS}
+        for feed_url, _, fetch_error in feed_results:
+            if feed_url in channels_by_url:
+                poll_scheduler.record_poll(channels_by_url[feed_url], feed_cache.get(feed_url), fetch_error is None)
+        poll_scheduler.save(CHANNELS)
+    summary_cache.prune()
+    transcript_cache.prune()
+    
+    # 이메일 발송 작업자 시작 (이전 실행에서 남은 이메일도 함께 발송)
+    outbox_worker = OutboxWorker().start()
+    if video_leases is not None:
+        video_leases.start()
+    if batch_backend is not None and auto_send:
+        # 완료된 배치 작업의 요약부터 발송
+        collect_batch_results(get_recipient_groups())
+    
+    # 2~4. 자막 → 요약 → 전송 단계를 큐로 연결하여 동시에 실행
+    # (검토 모드에서는 사용자가 확인하기 전에 다음 영상을 요약하지 않도록 메인 스레드에서 한 영상씩 실행)
+    stop_event = threading.Event()
+    transcript_retry_videos = []
+    deferred_videos = []
+    # 검토 모드와 전송하지 않는 실행에서는 모든 영상을 바로 요약
+    batch_channels = frozenset(
+        channel['channel_id'] for channel in CHANNELS if channel.get('mode') == 'batch'
+    ) if batch_backend is not None and auto_send else frozenset()
+    transcript_stage = make_transcript_stage(transcript_retry_videos)
+    summarize_stage = make_summarize_stage(deferred_videos, batch_channels)
+    delivery_stage = make_delivery_stage(stats, stop_event, interactive, auto_send)
+    
+    if not interactive:
+        transcript_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        summary_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        delivery_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        _run_stage("transcript", transcript_stage, transcript_queue, summary_queue, TRANSCRIPT_WORKERS, stop_event)
+        _run_stage("summary", summarize_stage, summary_queue, delivery_queue, SUMMARY_WORKERS, stop_event)
+        delivery_closer = _run_stage("delivery", delivery_stage, delivery_queue, None, 1, stop_event)
+    
+    # 피드 탐색은 메인 스레드에서 수행 (큐가 가득 차면 다음 단계가 따라올 때까지 대기)
+    new_videos = 0
+    try:
+        for video in discover_new_videos(feed_results, feed_cache, time_threshold, stats):
+            if stop_event.is_set():
+                break
+            if max_videos and new_videos >= max_videos:
+                log.info("\n⏹ 최대 처리 개수(%s개) 도달, 나머지는 다음 실행에서 처리", max_videos)
+                break
+            # 다른 작업자가 이미 처리했거나 처리 중인 영상은 건너뜀
+            if video_leases is not None and not video_leases.claim(video['video_id']):
+                continue
+            new_videos += 1
+            # 일일 한도를 다 썼으면 자막 추출도 하지 않음 (다음 실행에서 다시 발견됨)
+            if gemini_pool.daily_exhausted():
+                deferred_videos.append(video)
+                continue
+            if interactive:
+                _run_serial((transcript_stage, summarize_stage, delivery_stage), video)
+            else:
+                transcript_queue.put(video)
+    finally:
+        if not interactive:
+            transcript_queue.put(_PIPELINE_DONE)
+    
+    # Ctrl+C로 중단할 수 있도록 짧은 간격으로 대기
+    while not interactive and delivery_closer.is_alive():
+        delivery_closer.join(timeout=0.5)
+    
+    # 배치 대기열에 충분히 모였으면 배치 작업 제출
+    if batch_backend is not None:
+        submit_batch_requests()
+    
+    # 다이제스트 그룹: 발송할 때가 된 그룹의 요약을 한 통의 이메일로 발송 대기열에 저장
+    flush_digests(get_recipient_groups())
+    
+    # 발송 가능한 이메일을 모두 보낸 뒤 작업자 종료
+    outbox_worker.finish()
+    if video_leases is not None:
+        video_leases.stop()  # 연기된 영상의 임대는 돌려줌
+    
+    # 이번 실행 결과로 피드별 탐색 기준점 갱신 (중간에 중단되면 이전 기준점 유지)
+    update_high_water_marks(feed_cache, processed_videos, time_threshold)
+    save_feed_cache(feed_cache)
+    
+    if deferred_videos and gemini_pool.daily_exhausted():
+        print_quota_exceeded_help()
+    
+    # 최종 통계
+    log.info("\n%s", '='*60)
+    log.info("📊 처리 완료 통계")
+    log.info("%s", '='*60)
+    log.info("✅ 요약 생성: %s개", stats['processed'])
+    log.info("⏭ 캐시 스킵: %s개", stats['skipped_cached'])
+    log.info("⏭ 오래된 영상 스킵: %s개", stats['skipped_old'])
+    log.info("⏭ 변경 없는 피드 스킵: %s개", stats['skipped_unchanged'])
+    log.info("⏸ 한도로 연기: %d개", len(deferred_videos))
+    log.info("⏸ 자막 오류로 연기: %d개", len(transcript_retry_videos))
+    if video_leases is not None:
+        log.info("🔒 다른 작업자가 처리: %s개", video_leases.claimed_elsewhere)
+    if batch_backend is not None:
+        log.info("📦 배치 요약: 대기열 저장 %s개, 제출 %s개, 도착 %s개",
+                 metrics.counters.get('batch_enqueued', 0),
+                 metrics.counters.get('batch_requests_submitted', 0),
+                 metrics.counters.get('batch_results', 0))
+    log.info("💾 요약 캐시: 적중 %s개 / 미적중 %s개",
+             metrics.counters.get('summary_cache_hits', 0), metrics.counters.get('summary_cache_misses', 0))
+    log.info("📧 이메일 발송: %s개 (실패 %s개, 재시도 대기 %s개)",
+             outbox_worker.sent_count, outbox_worker.failed_count, count_pending_emails())
+    gemini_usage = gemini_pool.usage()
+    log.info("🔢 오늘 Gemini 사용량: 요청 %s/%s회, 입력 토큰 %s/%s개 (키 %d개 × 모델 %d개)",
+             gemini_usage['requests'], gemini_usage['requests_per_day'],
+             format(gemini_usage['input_tokens'], ','), format(gemini_usage['input_tokens_per_day'], ','),
+             len(gemini_pool.api_keys), len(gemini_pool.models))
+    log.info("%s", '='*60)
+    
+    # 실행 보고서 저장 (어느 채널/단계가 시간과 한도를 많이 쓰는지 확인용)
+    stats['deferred'] = len(deferred_videos)
+    stats['transcript_deferred'] = len(transcript_retry_videos)
+    stats['claimed_elsewhere'] = video_leases.claimed_elsewhere if video_leases is not None else 0
+    stats['emails_sent'] = outbox_worker.sent_count
+    stats['emails_failed'] = outbox_worker.failed_count
+    report = metrics.build_report(stats)
+    if report_file:
+        metrics.write_json(report, report_file)
+    if prometheus_file:
+        metrics.write_prometheus(report, prometheus_file)
+
+def run_daemon(interval, jitter, **run_options):
+    """interval초(±jitter초)마다 반복 실행하며 새 영상을 처리 (Ctrl+C로 종료)
+
+    채널 확인 일정이 있으면 가장 빠른 채널의 확인 시각에 맞춰 더 일찍 깨어납니다.
+    """
+    log.info("🔁 데몬 모드: %s초(±%s초)마다 확인", interval, jitter)
+    if batch_backend is not None and run_options.get('auto_send'):
+        start_batch_poller()
+    while True:
+        started = time.time()
+        try:
+            process_youtube_automation(**run_options)
+        except Exception as e:
+            # 한 번의 실행이 실패해도 데몬은 계속 동작
+            log.error("❌ 실행 중 오류 발생: %s", e)
+            log.debug("상세 오류", exc_info=True)
+        delay = max(0, interval + random.uniform(-jitter, jitter) - (time.time() - started))
+        if poll_scheduler is not None:
+            # 자주 올리는 채널의 확인 시각이 먼저 오면 그때 깨어남
+            next_due_at = poll_scheduler.next_due_at(CHANNELS)
+            if next_due_at is not None:
+                delay = min(delay, max(DAEMON_MIN_SLEEP, next_due_at - time.time()))
+        next_run = datetime.now() + timedelta(seconds=delay)
+        log.info("💤 다음 확인: %s (%.0f초 후)", next_run.strftime('%Y-%m-%d %H:%M:%S'), delay)
+        time.sleep(delay)
+
+def parse_args(argv=None):
+    """명령줄 옵션 해석"""
+    parser = argparse.ArgumentParser(
+        prog='tube.letter',
+        description='유튜브 채널의 새 영상을 Gemini로 요약하여 이메일로 보내는 프로그램',
+    )
+    parser.add_argument('--interactive', action='store_true',
+                        help='영상마다 이메일 전송 여부와 계속 진행 여부를 묻는 검토 모드')
+    parser.add_argument('--auto-send', action='store_true',
+                        help='묻지 않고 모든 요약을 이메일로 전송 (cron, 작업 스케줄러용)')
+    parser.add_argument('--no-send', action='store_true',
+                        help='묻지 않고 요약만 출력 (전송 및 처리 기록 없음, 다음 실행에서 다시 확인)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='새 영상 목록만 확인 (자막/Gemini/이메일 호출 및 상태 저장 없음)')
+    parser.add_argument('--max-videos', type=int, default=None, metavar='N',
+                        help='한 번의 실행에서 처리할 최대 새 영상 수')
+    parser.add_argument('--digest', action='store_true',
+                        help='영상마다 받는(immediate) 수신자 그룹도 실행마다 다이제스트 한 통으로 전송')
+    parser.add_argument('--report', default=RUN_REPORT_FILE, metavar='PATH',
+                        help=f'실행 보고서(JSON) 저장 경로 (기본값: {RUN_REPORT_FILE}, 빈 값이면 저장 안 함)')
+    parser.add_argument('--prometheus-textfile', default=None, metavar='PATH',
+                        help='Prometheus node_exporter textfile 형식의 지표 저장 경로')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        default='DEBUG' if DEBUG else 'INFO',
+                        help='출력할 로그 수준 (기본값: DEBUG 플래그에 따름)')
+    channels = parser.add_argument_group('채널 목록 관리 (실행 후 종료)')
+    channels.add_argument('--import-subscriptions', metavar='PATH',
+                          help='Google Takeout 구독정보.csv, Takeout zip 또는 rss_feeds.txt에서 채널 가져오기')
+    channels.add_argument('--priority', type=int, default=None,
+                          help=f'가져오거나 --set-channel로 바꿀 채널의 우선순위 (기본값: {CHANNEL_DEFAULT_PRIORITY})')
+    channels.add_argument('--poll-interval', type=int, default=None, metavar='SECONDS',
+                          help=f'가져오거나 --set-channel로 바꿀 채널의 확인 간격 (기본값: {CHANNEL_DEFAULT_POLL_INTERVAL})')
+    channels.add_argument('--mode', choices=CHANNEL_MODES, default=None,
+                          help=f'가져오거나 --set-channel로 바꿀 채널의 요약 방식 (기본값: {CHANNEL_DEFAULT_MODE}, '
+                               'batch: Gemini 배치 작업으로 모아서 요약)')
+    channels.add_argument('--set-channel', metavar='CHANNEL_ID',
+                          help='채널의 --priority/--poll-interval/--mode 값 변경')
+    channels.add_argument('--enable-channel', action='append', default=[], metavar='CHANNEL_ID',
+                          help='채널 사용 (여러 번 지정 가능)')
+    channels.add_argument('--disable-channel', action='append', default=[], metavar='CHANNEL_ID',
+                          help='채널 사용 중지 (여러 번 지정 가능)')
+    channels.add_argument('--list-channels', action='store_true', help='채널 목록 출력')
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='I/N',
+                        help='채널을 N개로 나눠 I번째(0부터)만 처리 (여러 프로세스/호스트가 같은 상태 DB를 쓸 때)')
+    parser.add_argument('--poll-all', action='store_true',
+                        help='채널별 확인 일정과 관계없이 이번 실행에서 모든 채널 확인')
+    parser.add_argument('--daemon', action='store_true',
+                        help='종료하지 않고 일정 간격으로 반복 실행')
+    parser.add_argument('--interval', type=int, default=3600, metavar='SECONDS',
+                        help='데몬 모드 최대 실행 간격 (초, 기본값: 3600, 채널 확인 일정이 더 빠르면 그때 실행)')
+    parser.add_argument('--jitter', type=int, default=300, metavar='SECONDS',
+                        help='데몬 모드 실행 간격에 더할 무작위 편차 (초, 기본값: 300)')
+    args = parser.parse_args(argv)
+    if args.daemon and args.interactive:
+        parser.error('--daemon과 --interactive는 함께 사용할 수 없습니다.')
+    if sum((args.interactive, args.auto_send, args.no_send)) > 1:
+        parser.error('--interactive, --auto-send, --no-send 중 하나만 사용할 수 있습니다.')
+    # 전송 방식은 추측하지 않음 (말없이 요약만 하면 한도만 쓰고 아무것도 보내지 않게 됨)
+    if not (args.interactive or args.auto_send or args.no_send or args.dry_run or is_channel_command(args)):
+        parser.error('실행 방식을 지정하세요: --auto-send(모두 전송), --interactive(영상마다 확인), '
+                     '--no-send(요약만), --dry-run(새 영상 목록만)')
+    return args
+
+def is_channel_command(args):
+    """채널 목록 관리 명령(실행 후 종료)인지 확인"""
+    return bool(args.import_subscriptions or args.set_channel or args.enable_channel
+                or args.disable_channel or args.list_channels)
+
+def manage_channels(args):
+    """--import-subscriptions, --set-channel, --enable-channel, --disable-channel, --list-channels 처리"""
+    try:
+        if args.import_subscriptions:
+            added, updated, invalid = import_subscriptions(
+                args.import_subscriptions,
+                CHANNEL_DEFAULT_PRIORITY if args.priority is None else args.priority,
+                CHANNEL_DEFAULT_POLL_INTERVAL if args.poll_interval is None else args.poll_interval,
+                args.mode or CHANNEL_DEFAULT_MODE,
+            )
+            log.info("📥 구독 채널 가져오기: 추가 %s개, 갱신 %s개, 무효 %s개", added, updated, invalid)
+        changes = [(args.set_channel, {'priority': args.priority, 'poll_interval': args.poll_interval, 'mode': args.mode})] if args.set_channel else []
+        changes += [(channel_id, {'enabled': 1}) for channel_id in args.enable_channel]
+        changes += [(channel_id, {'enabled': 0}) for channel_id in args.disable_channel]
+        for channel_id, fields in changes:
+            fields = {key: value for key, value in fields.items() if value is not None}
+            if update_channel(channel_id, **fields):
+                log.info("✅ 채널 변경: %s %s", channel_id, fields)
+            else:
+                log.warning("⚠ 채널을 찾을 수 없거나 바꿀 값이 없습니다: %s", channel_id)
+        if args.list_channels:
+            print_channels()
+    except Exception as e:
+        log.error("❌ 채널 목록 처리 실패: %s", e)
+        return 1
+    return 0
+
+def main(argv=None):
+    """프로그램 진입점: 옵션 해석 → 설정/피드/상태 로드 → 실행"""
+    global DIGEST_MODE, CHANNELS, RSS_FEEDS, RECIPIENT_GROUPS, gemini_pool, processed_videos, poll_scheduler
+    global WORKER_SHARD_INDEX, WORKER_SHARD_COUNT, FEED_CACHE_FILE, video_leases, batch_backend, STATE_READ_ONLY
+    args = parse_args(argv)
+    if args.digest:
+        DIGEST_MODE = True
+    if args.shard:
+        WORKER_SHARD_INDEX, WORKER_SHARD_COUNT = args.shard
+        # 채널별 상태 파일과 실행 보고서는 샤드마다 따로 저장
+        FEED_CACHE_FILE = shard_state_file(FEED_CACHE_FILE)
+        if args.report:
+            args.report = shard_state_file(args.report)
+        if args.prometheus_textfile:
+            args.prometheus_textfile = shard_state_file(args.prometheus_textfile)
+    run_options = {
+        'interactive': args.interactive,
+        'auto_send': args.auto_send,
+        'dry_run': args.dry_run,
+        'max_videos': args.max_videos,
+        'report_file': args.report or None,
+        'prometheus_file': args.prometheus_textfile or None,
+        'poll_all': args.poll_all,
+    }
+    
+    # 로그는 메시지만 표준 출력으로 (비활성화된 수준의 메시지는 포맷팅 비용 없음)
+    logging.basicConfig(level=args.log_level, format='%(message)s', stream=sys.stdout)
+    
+    log.debug("=" * 60)
+    log.debug("🚀 TubeLetter 프로그램 시작")
+    log.debug("=" * 60)
+    
+    # 채널 목록 관리 명령은 인증 정보 없이 실행 후 종료
+    if is_channel_command(args):
+        return manage_channels(args)
+    
+    # 드라이런은 Gemini/이메일을 쓰지 않으므로 인증 정보 없이도 실행 가능 (상태 파일도 바꾸지 않음)
+    if args.dry_run:
+        STATE_READ_ONLY = True
+    # 수신자 그룹 로드 (설정 파일이 없으면 EMAIL_RECIPIENTS 전체가 한 그룹)
+    RECIPIENT_GROUPS = load_recipient_groups()
+    if RECIPIENT_GROUPS is None:
+        return 1
+    if not load_settings(require_credentials=not args.dry_run, require_recipients=not RECIPIENT_GROUPS):
+        return 1
+    
+    # 채널 목록 로드 (샤드로 나눠 실행하면 이 작업자의 채널만)
+    CHANNELS = load_channels()
+    if not CHANNELS:
+        log.error("❌ 사용 중인 채널이 없습니다.\n"
+                  "💡 python tube.letter.py --import-subscriptions 구독정보.csv 로 구독 채널을 가져오세요.")
+        return 1
+    if WORKER_SHARD_COUNT > 1:
+        total_channels = len(CHANNELS)
+        CHANNELS = filter_shard_channels(CHANNELS)
+        log.info("🧩 샤드 %s/%s: 채널 %d/%s개", WORKER_SHARD_INDEX, WORKER_SHARD_COUNT, len(CHANNELS), total_channels)
+    RSS_FEEDS = [channel['feed_url'] for channel in CHANNELS]
+    log.debug("\n📊 디버깅: 총 %d개의 채널이 로드됨", len(CHANNELS))
+    for i, channel in enumerate(CHANNELS, 1):
+        log.debug("  %d. %s (%s)", i, channel['name'], channel['channel_id'])
+    log.debug("")
+    
+    # Gemini 한도와 피드 요청 예산은 샤드 작업자들이 똑같이 나눠 씀
+    gemini_limits = {name: max(1, limit // WORKER_SHARD_COUNT) for name, limit in GEMINI_FREE_TIER_LIMITS.items()}
+    gemini_pool = GeminiClientPool(GEMINI_API_KEYS, GEMINI_MODELS, gemini_limits, shard_state_file(GEMINI_USAGE_FILE))
+    log.info("✅ 사용할 모델: %s (API 키 %d개)", ', '.join(GEMINI_MODELS), len(gemini_pool.api_keys))
+    poll_scheduler = PollScheduler(shard_state_file(POLL_SCHEDULE_FILE), POLL_BUDGET_PER_HOUR / WORKER_SHARD_COUNT)
+    if not args.dry_run:
+        video_leases = VideoLeases()
+        batch_backend = GeminiBatchBackend(gemini_pool)
+    
+    # 프로그램 시작 시 캐시 로드
+    if not args.dry_run:
+        prune_processed_videos()
+    processed_videos = load_processed_videos()
+    
+    try:
+        if args.daemon:
+            run_daemon(args.interval, args.jitter, **run_options)
+        else:
+            log.info("🔄 자동화 작업 실행 중...")
+            process_youtube_automation(**run_options)
+            log.info("✅ 작업 완료\n")
+    except KeyboardInterrupt:
+        log.info("\n🛑 사용자 요청으로 프로그램 종료")
+    except Exception as e:
+        log.error("❌ 오류 발생: %s", e)
+        import traceback
+        traceback.print_exc()
+        return 1
+    return 0
+
+# 프로그램 실행
+if __name__ == "__main__":
+    sys.exit(main())